@@ -0,0 +1,167 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+import httpx
+from wikidot.module.site import Site
+
+from governor import endpoint_of, governor
+from metrics import metrics
+from replay import Recorder
+
+
+logger = logging.getLogger(__name__)
+
+
+# 试运行时不发送的写操作；createPageDiscussionThread在讨论帖不存在时会创建讨论帖，试运行时由get_discuss_id跳过
+WRITE_EVENTS = {"saveEditPost", "savePost", "saveTags"}
+
+
+def _status(response: httpx.Response) -> str | None:
+    try:
+        return response.json().get("status")
+    except ValueError:
+        return None
+
+
+class AMCClient:
+    # 长期存在的连接池客户端，事件循环运行在独立线程中，同步与异步调用方共用同一个连接池
+    def __init__(
+        self,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        base_url: str | None = None,
+        dry_run: bool = False,
+        recorder: "Recorder | None" = None,
+        reauthenticate: Callable[[str | None], bool] | None = None,
+    ):
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("未安装h2，改用HTTP/1.1连接")
+                http2 = False
+
+        self.base_url = base_url
+        self.dry_run = dry_run
+        self.recorder = recorder
+        self.reauthenticate = reauthenticate  # 传入请求所用的会话id，会话已更换时返回True
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="amc-client", daemon=True)
+        self._thread.start()
+        self._client: httpx.AsyncClient = self._submit(self._create_client(
+            httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2,
+        )).result()
+        self._closed = False
+        atexit.register(self.close)
+
+    async def _create_client(self, limits: httpx.Limits, http2: bool) -> httpx.AsyncClient:
+        return httpx.AsyncClient(limits=limits, http2=http2)
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def url(self, site: Site) -> str:
+        if self.base_url is not None:
+            return f"{self.base_url.rstrip('/')}/{site.unix_name}/ajax-module-connector.php"
+        return (
+            f'http{"s" if site.ssl_supported else ""}://{site.unix_name}.wikidot.com/'
+            f"ajax-module-connector.php"
+        )
+
+    def page_url(self, site: Site, path: str) -> str:
+        if self.base_url is not None:
+            return f"{self.base_url.rstrip('/')}/{site.unix_name}/{path}"
+        return f"{site.url}/{path}"
+
+    async def _send(self, endpoint: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        for attempt in range(governor.attempts):
+            last = attempt == governor.attempts - 1
+            await governor.aacquire(endpoint)
+            start = time.perf_counter()
+            try:
+                response = await send()
+            except httpx.TransportError:
+                if last:
+                    governor.count(endpoint, "failures")
+                    raise
+            else:
+                metrics.observe(endpoint, time.perf_counter() - start, len(response.request.content), len(response.content))
+                # 状态码5xx与try_again可以重试，其余状态交给调用方判断
+                if not (response.status_code >= 500 or _status(response) == "try_again") or last:
+                    return response
+            governor.count(endpoint, "retries")
+            await asyncio.sleep(governor.backoff(attempt))
+        return response
+
+    async def _post(self, site: Site, body: dict[str, Any]) -> httpx.Response:
+        amc = site.client.amc_client
+        body["wikidot_token7"] = 123456
+        endpoint = endpoint_of(body)
+        if self.dry_run and body.get("event") in WRITE_EVENTS:
+            logger.info("试运行，跳过%s请求", endpoint)
+            governor.count(endpoint, "dry_run")
+            return httpx.Response(200, json={"status": "ok"})
+        session_id = amc.header.cookie.get("WIKIDOT_SESSION_ID")
+
+        def send() -> Awaitable[httpx.Response]:
+            # 每次发送时重新取请求头，重新登录后使用新的会话
+            return self._client.post(
+                self.url(site),
+                headers=amc.header.get_header(),
+                data=body,
+                timeout=amc.config.request_timeout,
+            )
+
+        response = await self._send(endpoint, send)
+        # 登录会话可能已被Wikidot提前结束，重新登录后用新会话重试一次，仍无权限时交给调用方
+        if _status(response) == "no_permission" and self.reauthenticate is not None:
+            if await asyncio.to_thread(self.reauthenticate, session_id):
+                response = await self._send(endpoint, send)
+        if self.recorder is not None:
+            self.recorder.record("POST", site.unix_name, body, response)
+        return response
+
+    async def _get(self, site: Site, path: str) -> httpx.Response:
+        response = await self._send("GET", lambda: self._client.get(
+            self.page_url(site, path),
+            timeout=site.client.amc_client.config.request_timeout,
+        ))
+        if self.recorder is not None:
+            self.recorder.record("GET", site.unix_name, path, response)
+        return response
+
+    async def _gather(self, site: Site, bodies: list[dict[str, Any]]) -> list[httpx.Response]:
+        return list(await asyncio.gather(*(self._post(site, body) for body in bodies)))
+
+    async def _gather_get(self, site: Site, paths: list[str]) -> list[httpx.Response]:
+        return list(await asyncio.gather(*(self._get(site, path) for path in paths)))
+
+    def request(self, site: Site, bodies: list[dict[str, Any]]) -> list[httpx.Response]:
+        return self._submit(self._gather(site, bodies)).result()
+
+    def get(self, site: Site, paths: list[str]) -> list[httpx.Response]:
+        return self._submit(self._gather_get(site, paths)).result()
+
+    async def arequest(self, site: Site, bodies: list[dict[str, Any]]) -> list[httpx.Response]:
+        return await asyncio.wrap_future(self._submit(self._gather(site, bodies)))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._submit(self._client.aclose()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
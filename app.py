@@ -0,0 +1,185 @@
+import functools
+import logging
+import sys
+import threading
+from typing import Any, Callable, Iterable
+
+import httpx
+import wikidot
+import yaml
+from wikidot.module.auth import HTTPAuthentication
+from wikidot.module.site import Site
+
+from amc_client import AMCClient
+from discuss_cache import DiscussCache
+from governor import governor
+from output import DataWriter
+from replay import Recorder
+from scheduler import Scheduler, Snapshot
+from session_cache import SessionCache
+from sister_index import SisterIndex
+from source_cache import SourceCache
+from state_store import open_state_store
+from status_api import StatusAPI
+from thread_cache import ThreadCache
+from write_batch import WriteBatch
+
+
+logger = logging.getLogger(__name__)
+
+
+def lazy(func: Callable):
+    # 首次访问时创建并缓存，页面并发处理时也只创建一次
+    name = func.__name__
+
+    @property
+    @functools.wraps(func)
+    def getter(self):
+        if name not in self._resources:
+            with self._lock:
+                if name not in self._resources:
+                    self._resources[name] = func(self)
+        return self._resources[name]
+    return getter
+
+
+class App:
+    # 程序上下文：配置、客户端、站点与各类状态都在首次使用时创建，之后每轮复用，创建App本身不做网络与文件操作
+    def __init__(
+        self,
+        config_path: str = "config.yaml",
+        poll: Callable[[], Iterable[tuple[str, Snapshot]]] | None = None,
+        overrides: dict[str, Any] | None = None,
+    ):
+        # overrides覆盖配置文件中的同名项，多站点运行时用于各站点自己的设置
+        self.config_path = config_path
+        self.poll = poll
+        self.overrides = overrides or {}
+        self._lock = threading.RLock()
+        self._resources: dict[str, Any] = {}
+        self._session_lock = threading.Lock()
+        self._session_fresh = False  # 当前会话是否为本进程登录得到，而不是从缓存中读取
+
+    @lazy
+    def config(self) -> dict:
+        with open(self.config_path, "r", encoding="utf-8") as f:
+            return {**yaml.safe_load(f), **self.overrides}
+
+    @lazy
+    def pending_pages(self):
+        pending_pages = open_state_store(self.config)
+        logger.info('载入历史数据：%s个页面', len(pending_pages))
+        return pending_pages
+
+    @lazy
+    def discuss_cache(self) -> DiscussCache:
+        return DiscussCache()
+
+    @lazy
+    def thread_cache(self) -> ThreadCache:
+        return ThreadCache(self.config.get("post_cache_ttl", 21600))
+
+    @lazy
+    def source_cache(self) -> SourceCache:
+        return SourceCache(
+            self.config.get("source_cache_path", "page_sources.db"),
+            self.config.get("source_cache_mb", 64) * 1024 * 1024,
+        )
+
+    @lazy
+    def session_cache(self) -> SessionCache:
+        return SessionCache(self.config.get("session_path", "session.json"), self.config.get("session_ttl", 86400))
+
+    @lazy
+    def page_ids(self) -> dict[str, int]:
+        # 页面全名 -> 页面id，跨轮复用，避免每轮为每个候选页面请求一次页面
+        return {}
+
+    @lazy
+    def output(self) -> DataWriter:
+        return DataWriter(self.config.get("data_path", "data.json"), self.config.get("sources_dir", "sources"))
+
+    @property
+    def staff_unix_names(self) -> list[str]:
+        return self.config["staffs"]
+
+    @lazy
+    def amc_client(self) -> AMCClient:
+        governor.configure(**self.config.get("rate_limit", {}))
+        # 试运行（--dry-run或dry_run: true）时不发送帖子与标签修改，record_path用于录制AMC请求供replay.py回放
+        return AMCClient(
+            **self.config.get("amc_pool", {}),
+            dry_run=self.config.get("dry_run", False) or "--dry-run" in sys.argv,
+            recorder=Recorder(self.config["record_path"]) if self.config.get("record_path") else None,
+            reauthenticate=self.refresh_session,
+        )
+
+    @lazy
+    def wd(self) -> wikidot.Client:
+        wd = wikidot.Client()
+        if self.amc_client.base_url is not None:
+            return wd  # 连接本地替身时不登录
+        username = self.config["username"]
+        if (session_id := self.session_cache.load(username)) is not None:
+            logger.info("复用缓存的登录会话")
+            wd.amc_client.header.set_cookie("WIKIDOT_SESSION_ID", session_id)
+        else:
+            self._login(wd)
+        wd.is_logged_in = True
+        wd.username = username
+        return wd
+
+    def _login(self, wd: wikidot.Client):
+        username = self.config["username"]
+        logger.info("以%s登录", username)
+        HTTPAuthentication.login(wd, username, self.config["password"])
+        self.session_cache.save(username, wd.amc_client.header.cookie["WIKIDOT_SESSION_ID"])
+        self._session_fresh = True
+
+    def refresh_session(self, used: str | None) -> bool:
+        # 请求返回no_permission时由AMCClient调用：缓存的会话可能已被Wikidot提前结束，清除缓存后重新登录
+        # 返回True表示会话已更换，可以用新会话重试一次；本进程登录得到的会话仍无权限时才是真正缺少权限
+        if self.amc_client.base_url is not None:
+            return False
+        with self._session_lock:
+            header = self.wd.amc_client.header
+            if header.cookie.get("WIKIDOT_SESSION_ID") != used:
+                return True  # 其他请求已经重新登录
+            if self._session_fresh:
+                return False
+            logger.warning("缓存的登录会话已失效，重新登录")
+            self.session_cache.clear()
+            self._login(self.wd)
+            return True
+
+    def get_site(self, name: str) -> Site:
+        # 连接本地替身时不请求Wikidot，直接构造站点
+        if self.amc_client.base_url is not None:
+            return Site(client=self.wd, id=0, title=name, unix_name=name, domain=f"{name}.wikidot.com", ssl_supported=True)
+        return self.wd.site.get(name)
+
+    @lazy
+    def site(self) -> Site:
+        return self.get_site(self.config["siteUnixName"])
+
+    def amc_request(self, bodies: list[dict[str, Any]]) -> list[httpx.Response]:
+        return self.amc_client.request(self.site, bodies)
+
+    @lazy
+    def write_batch(self) -> WriteBatch:
+        return WriteBatch(self.amc_request, self.config.get("write_batch_size", 20))
+
+    @lazy
+    def sister_index(self) -> SisterIndex:
+        return SisterIndex(self.get_site, self.amc_client, self.config["sites"], self.config.get("sister_index_ttl", 86400))
+
+    @lazy
+    def status_api(self) -> StatusAPI | None:
+        # 配置了status_api时启动本地状态接口，多站点运行时需要为每个站点设置不同的端口
+        if not self.config.get("status_api"):
+            return None
+        return StatusAPI(**self.config["status_api"]).start()
+
+    @lazy
+    def scheduler(self) -> Scheduler:
+        return Scheduler(self.poll, self.config.get("poll_interval", 300), self.config.get("full_rescan_interval", 21600))
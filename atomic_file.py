@@ -0,0 +1,15 @@
+import os
+
+
+def write_atomic(path: str, data: str | bytes, mode: int = 0o666):
+    # 先写临时文件再替换，读取方不会读到写了一半的文件，写入中断时原文件也不受影响
+    # mode为新文件的权限（再受umask限制）；残留的临时文件先删除，以免沿用其原有权限
+    tmp_path = f"{path}.tmp"
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with open(fd, "wb") as file:
+        file.write(data.encode("utf-8") if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
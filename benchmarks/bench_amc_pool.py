@@ -0,0 +1,99 @@
+# 对比每次新建httpx.AsyncClient与共享连接池的单次请求延迟
+# 用法：python benchmarks/bench_amc_pool.py [请求次数]
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from amc_client import AMCClient  # noqa: E402
+from governor import governor  # noqa: E402
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = json.dumps({"status": "ok", "body": ""}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fake_site():
+    header = SimpleNamespace(cookie={}, get_header=lambda: {
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"})
+    amc = SimpleNamespace(header=header, config=SimpleNamespace(request_timeout=20))
+    return SimpleNamespace(client=SimpleNamespace(amc_client=amc), ssl_supported=False, unix_name="stand-in")
+
+
+def bench_per_call(url: str, times: int) -> list[float]:
+    # 旧实现：每次调用新建事件循环与客户端
+    async def single(body):
+        client = httpx.AsyncClient()
+        try:
+            return await client.post(url, data=body)
+        finally:
+            await client.aclose()
+
+    latencies = []
+    for _ in range(times):
+        start = time.perf_counter()
+        asyncio.run(single({"moduleName": "Empty"}))
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_pooled(base_url: str, times: int) -> list[float]:
+    client = AMCClient(base_url=base_url)
+    site = fake_site()
+    latencies = []
+    try:
+        for _ in range(times):
+            start = time.perf_counter()
+            client.request(site, [{"moduleName": "Empty"}])
+            latencies.append(time.perf_counter() - start)
+    finally:
+        client.close()
+    return latencies
+
+
+def report(name: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    print(
+        f"{name:<10} mean={statistics.mean(latencies) * 1000:.2f}ms "
+        f"p50={latencies[len(latencies) // 2] * 1000:.2f}ms "
+        f"p95={latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms"
+    )
+
+
+def main():
+    # 基准测试不限速
+    governor.configure(rate=float("inf"), burst=float("inf"))
+    times = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        report("per-call", bench_per_call(f"{base_url}/ajax-module-connector.php", times))
+        report("pooled", bench_pooled(base_url, times))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# 在本地合成站点上以试运行模式完整执行检查流程，测量整轮耗时与吞吐量
+# 用法：python benchmarks/bench_cycle.py [页面数] [模拟延迟毫秒] [录制文件.jsonl]
+# 指定录制文件时优先回放其中的响应，未录制的请求由合成站点回答
+import functools
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from replay import StandInServer, load_recordings  # noqa: E402
+
+SITE = "synthetic-wiki"
+SISTER = "synthetic-sister"
+STAFF = "BR_Bot"
+NOW = int(time.time())
+
+
+class SyntheticSite:
+    # 按Wikidot响应结构生成的站点，约1/3为原创，1/50为deleted分类，部分低分页面带删除宣告
+    def __init__(self, count: int, delay: float = 0.0, seed: int = 0):
+        self.delay = delay
+        rng = random.Random(seed)
+        self.pages = []
+        for i in range(count):
+            rating = rng.randint(-35, 20)
+            tags = ["原创"] if i % 3 == 0 else []
+            pending = rating < -2 and i % 4 == 0
+            if pending:
+                tags.append("待删除")
+            self.pages.append({
+                "id": 100000 + i,
+                "fullname": f"deleted:page-{i}" if i % 50 == 0 else f"page-{i}",
+                "title": f"Page {i}",
+                "rating": rating,
+                "tags": tags,
+                "created_at": NOW - (i % 90) * 86400 - 3600,
+                "revisions": 1 + i % 7,
+                # 一半的倒计时已到期
+                "deadline": NOW + (-3600 if i % 8 == 0 else 86400) if pending else None,
+            })
+        self.by_fullname = {page["fullname"]: page for page in self.pages}
+        self.by_id = {page["id"]: page for page in self.pages}
+        self.sister = {f"page-{i}" for i in range(count) if i % 3 != 0}
+
+    def respond(self, method: str, site_name: str, target: dict[str, str] | str):
+        if self.delay:
+            time.sleep(self.delay)
+        if method == "GET":
+            fullname = target.split("/norender")[0]
+            if (page := self.by_fullname.get(fullname)) is None:
+                return 404, ""
+            return 200, f"<script>WIKIREQUEST.info.pageId = {page['id']};</script>"
+        module = target.get("moduleName")
+        if module == "list/ListPagesModule":
+            return 200, json.dumps({"status": "ok", "body": self.list_pages(site_name, target)})
+        if target.get("event") == "createPageDiscussionThread":
+            return 200, json.dumps({"status": "ok", "thread_id": int(target["page_id"]) + 1000000})
+        if module == "forum/ForumViewThreadModule":
+            return 200, json.dumps({"status": "ok", "body": self.thread(int(target["t"]))})
+        if module == "forum/ForumViewThreadPostsModule":
+            return 200, json.dumps({"status": "ok", "body": self.posts(int(target["t"]))})
+        if module == "forum/sub/ForumEditPostFormModule":
+            return 200, json.dumps({"status": "ok", "body": self.edit_form(int(target["postId"]))})
+        if module == "viewsource/ViewSourceModule":
+            page = self.by_id[int(target["page_id"])]
+            return 200, json.dumps({"status": "ok", "body": f'<div class="page-source">{page["title"]}的源代码</div>'})
+        return None
+
+    @functools.lru_cache(maxsize=64)
+    def select(self, site_name: str, category: str, tags: str, rating: str, fullname: str) -> list[dict]:
+        if site_name != SITE:
+            return [{"fullname": name, "title": name, "rating": 0, "tags": [], "created_at": NOW, "revisions": 1}
+                    for name in sorted(self.sister)]
+        if fullname:
+            return [self.by_fullname[fullname]] if fullname in self.by_fullname else []
+        categories = category.split()
+        include = [name for name in categories if not name.startswith("-") and name != "*"]
+        exclude = {name[1:] for name in categories if name.startswith("-")}
+        required = {tag[1:] for tag in tags.split() if tag.startswith("+")}
+        excluded = {tag[1:] for tag in tags.split() if tag.startswith("-")}
+        any_of = {tag for tag in tags.split() if tag[0] not in "+-"}
+        limit = float(rating[1:]) if rating.startswith("<") else None
+        selected = []
+        for page in self.pages:
+            page_category = page["fullname"].split(":")[0] if ":" in page["fullname"] else "_default"
+            page_tags = set(page["tags"])
+            if include and page_category not in include or page_category in exclude:
+                continue
+            if not required <= page_tags or excluded & page_tags or any_of and not any_of & page_tags:
+                continue
+            if limit is not None and not page["rating"] < limit:
+                continue
+            selected.append(page)
+        return selected
+
+    def list_pages(self, site_name: str, query: dict[str, str]) -> str:
+        pages = self.select(site_name, query.get("category", "*"), query.get("tags", ""),
+                            query.get("rating", ""), query.get("fullname", ""))
+        per_page = int(query.get("perPage", 250))
+        offset = int(query.get("offset", 0))
+        fields = re.findall(r'\[\[span class="set (\w+)"\]\]', query["module_body"])
+        html = []
+        for page in pages[offset:offset + per_page]:
+            values = {
+                "fullname": page["fullname"],
+                "title": page["title"],
+                "rating": page["rating"],
+                "tags": " ".join(tag for tag in page["tags"] if not tag.startswith("_")),
+                "_tags": " ".join(tag for tag in page["tags"] if tag.startswith("_")),
+                "created_at": f'<span class="odate time_{page["created_at"]}">date</span>',
+                "revisions": page["revisions"],
+            }
+            html.append('<div class="page">' + "".join(
+                f'<span class="set {field}"><span class="name">{field}</span>'
+                f'<span class="value">{values.get(field, "")}</span></span>'
+                for field in fields
+            ) + "</div>")
+        total = max(1, -(-len(pages) // per_page))
+        if total > 1:
+            html.append(
+                f'<div class="pager"><span class="pager-no">page {offset // per_page + 1} of {total}</span>'
+                + "".join(f'<span class="target"><a>{no}</a></span>' for no in range(1, total + 1))
+                + '<span class="target"><a>next »</a></span></div>'
+            )
+        return "".join(html)
+
+    def thread(self, thread_id: int) -> str:
+        page = self.by_id[thread_id - 1000000]
+        posts = 3 if page["deadline"] is not None else 2
+        return (
+            '<div class="statistics">Started by: <span class="printuser">Wikidot</span><br/>'
+            f'Date: <span class="odate time_{page["created_at"]}">date</span><br/>'
+            f"Number of posts: {posts}<br/></div>"
+        )
+
+    def posts(self, thread_id: int) -> str:
+        page = self.by_id[thread_id - 1000000]
+        posts = []
+        if page["deadline"] is not None:
+            score = min(page["rating"], -2)
+            content = (
+                f"<p>由于条目的分数为{score}分，现根据删除政策，宣告将删除此页：</p>"
+                f'<iframe src="https://timer.backroomswiki.cn/timer/time={page["deadline"] * 1000}/type=delete"></iframe>'
+            )
+            posts.append((thread_id * 10, "职员帖：删除宣告", STAFF, content))
+        posts.extend((thread_id * 10 + n, f"回复{n}", f"user{n}", "<p>讨论内容</p>") for n in (1, 2))
+        return '<div id="thread-container-posts">' + "".join(
+            f'<div class="post-container" id="fpc-{post_id}"><div class="post" id="post-{post_id}">'
+            f'<div class="head"><div class="title">{title}</div><div class="info">'
+            f'<span class="printuser"><a href="#">{author}</a></span>'
+            f'<span class="odate time_{NOW}">date</span></div></div>'
+            f'<div class="content">{content}</div></div></div>'
+            for post_id, title, author, content in posts
+        ) + "</div>"
+
+    def edit_form(self, post_id: int) -> str:
+        return (
+            f'<form id="edit-post-form"><input value="{post_id}"/><input value="{post_id + 1}"/></form>'
+            '<input id="np-title" value="职员帖：删除宣告"/><textarea id="np-text">旧的删除宣告</textarea>'
+        )
+
+
+def serve(count: int, delay: float, recordings: dict | None, ready: multiprocessing.Queue):
+    server = StandInServer(recordings=recordings, fallback=SyntheticSite(count, delay).respond)
+    ready.put(server.base_url)
+    server.serve_forever()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    delay = (int(sys.argv[2]) if len(sys.argv) > 2 else 0) / 1000
+    recordings = load_recordings(sys.argv[3]) if len(sys.argv) > 3 else None
+    # 替身在独立进程中运行，不与被测流程争用GIL
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(count, delay, recordings, ready), daemon=True)
+    server.start()
+    base_url = ready.get()
+
+    workdir = tempfile.mkdtemp(prefix="bench-cycle-")
+    os.chdir(workdir)
+    os.makedirs("logs")
+    with open("config.yaml", "w", encoding="utf-8") as file:
+        yaml.safe_dump({
+            "siteUnixName": SITE,
+            "staffs": [STAFF],
+            "sites": [SISTER],
+            "dry_run": True,
+            "max_concurrency": 32,
+            "amc_pool": {"base_url": base_url, "max_connections": 64, "max_keepalive_connections": 64},
+            "rate_limit": {"rate": float("inf"), "burst": float("inf")},
+        }, file, allow_unicode=True)
+
+    start = time.perf_counter()
+    import bkr_delete
+    print(f"导入耗时 {time.perf_counter() - start:.2f}s，工作目录 {workdir}")
+    bkr_delete.logger.setLevel("WARNING")
+
+    for label in ("首轮（完整检查）", "第二轮（无变化）"):
+        before = sum(counter["requests"] for counter in bkr_delete.governor.stats().values())
+        start = time.perf_counter()
+        bkr_delete.main()
+        elapsed = time.perf_counter() - start
+        requests = sum(counter["requests"] for counter in bkr_delete.governor.stats().values()) - before
+        with open("data.json", encoding="utf-8") as file:
+            data = json.load(file)
+        print(
+            f"{label} {elapsed:.2f}s {count / elapsed:.0f} pages/s {requests}个请求 "
+            f"倒计时{len(data['pre_delete_pages'])} 待删除{len(data['deleted_pages'])} 错误{len(data['errors'])}"
+        )
+    dry_run = sum(counter["dry_run"] for counter in bkr_delete.governor.stats().values())
+    print(f"试运行跳过{dry_run}个写操作")
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# 对比确认待删除页面是否存在的两种方式：逐个按全名查询，与对照本轮候选列表后只确认剩余页面
+# 用法：python benchmarks/bench_existence.py [页面数]
+import os
+import sys
+import time
+
+import wikidot
+from wikidot.module.site import Site
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from amc_client import AMCClient  # noqa: E402
+from bench_cycle import SITE, SyntheticSite  # noqa: E402
+from bkr_delete import candidate_queries  # noqa: E402
+from governor import governor  # noqa: E402
+from listing import get_pages, list_fullnames, missing_pages  # noqa: E402
+from replay import StandInServer  # noqa: E402
+
+
+def requests() -> int:
+    return sum(counter["requests"] for counter in governor.stats().values())
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    synthetic = SyntheticSite(count)
+    server = StandInServer(fallback=synthetic.respond).start()
+    governor.configure(rate=float("inf"), burst=float("inf"))
+    client = AMCClient(base_url=server.base_url, max_connections=32, max_keepalive_connections=32)
+    site = Site(client=wikidot.Client(), id=0, title=SITE, unix_name=SITE, domain=f"{SITE}.wikidot.com", ssl_supported=True)
+
+    # 跟踪的页面：全部带待删除标签的页面，另有已删除的页面与标签被移除后不在候选列表中的页面
+    tracked = [page["fullname"] for page in synthetic.pages if "待删除" in page["tags"]]
+    tracked += [f"gone-{i}" for i in range(50)]
+    tracked += [page["fullname"] for page in synthetic.pages if page["rating"] >= 7][:20]
+    print(f"{count}个页面，跟踪{len(tracked)}个待删除页面")
+
+    before, start = requests(), time.perf_counter()
+    expected = {fullname for fullname, page in zip(tracked, get_pages(client, site, tracked, ["fullname"], with_ids=False)) if page is None}
+    print(f"逐个查询 {time.perf_counter() - start:.2f}s {requests() - before}个请求")
+
+    before, start = requests(), time.perf_counter()
+    listed = set().union(*(list_fullnames(client, site, **query) for query in candidate_queries()))
+    listing = requests() - before
+    missing = missing_pages(client, site, tracked, listed)
+    print(f"对照候选列表 {time.perf_counter() - start:.2f}s {requests() - before - listing}个请求（列表本身{listing}个请求，每轮检查中已经发送）")
+
+    assert missing == expected, (missing ^ expected)
+    print(f"两种方式都判断{len(missing)}个页面已不存在")
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# 对比BeautifulSoup解析与forum_parser解析讨论帖页面的耗时与内存峰值
+# 用法：python benchmarks/bench_forum_parser.py [保存的ForumViewThreadPostsModule响应body文件...]
+# 未指定文件时使用按Wikidot讨论帖结构生成的页面
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from forum_parser import parse_posts  # noqa: E402
+
+POST = """
+<div class="post-container" id="fpc-{id}">
+<div class="post" id="post-{id}">
+<div class="long">
+<div class="head">
+<div class="options"><a href="javascript:;">Options</a></div>
+<div class="title" id="post-title-{id}">{title}</div>
+<div class="info">
+<span class="printuser avatarhover"><a href="http://www.wikidot.com/user:info/user-{user}" onclick="WIKIDOT.page.listeners.userInfo({user}); return false;"><img class="small" src="https://www.wikidot.com/avatar.php?userid={user}&amp;amp;size=small" alt="User {user}" style="background-image:url(https://www.wikidot.com/userkarma.php?u={user})"/></a><a href="http://www.wikidot.com/user:info/user-{user}" onclick="WIKIDOT.page.listeners.userInfo({user}); return false;">User {user}</a></span>
+<span class="odate time_{time} format_%25e%20%25b%20%25Y%2C%20%25H%3A%25M%7Cagohover">01 Jan 2024 00:00</span>
+</div>
+</div>
+<div class="content" id="post-content-{id}">
+<p>本文分数为 -{score} 分，将于倒计时结束后删除。</p>
+<p><iframe src="https://timer.backroomswiki.cn/time={ms}" class="html-block-iframe" frameborder="0" width="100%"></iframe></p>
+{filler}
+</div>
+<div class="changes"></div>
+</div>
+</div>
+</div>
+"""
+
+
+def fake_thread(posts: int = 20) -> str:
+    filler = "<p>" + "讨论内容" * 200 + "</p>"
+    return (
+        '<div id="thread-container-posts">'
+        + "".join(
+            POST.format(id=1000 + i, title="职员帖：删除宣告" if i == 0 else f"回复{i}", user=i % 5,
+                        time=1700000000 + i, score=i, ms=(1700000000 + i) * 1000, filler=filler)
+            for i in range(posts)
+        )
+        + '</div><div class="pager"><span class="pager-no">page 1 of 1</span></div>'
+    )
+
+
+def parse_soup(thread_id: int, body: str) -> list[dict]:
+    # 原实现：整棵BeautifulSoup树，每个帖子保留div.content
+    html = BeautifulSoup(body, "lxml")
+    posts = []
+    for post in html.select("div.post"):
+        cuser = post.select_one("div.info span.printuser")
+        codate = post.select_one("div.info span.odate")
+        if (parent := post.parent.get("id")) != "thread-container-posts":
+            parent_id = int(re.search(r"fpc-(\d+)", parent).group(1))
+        else:
+            parent_id = ""
+        posts.append({
+            "id": int(re.search(r"post-(\d+)", post.get("id")).group(1)),
+            "thread_id": thread_id,
+            "title": post.select_one("div.title").text.strip(),
+            "parent_id": parent_id,
+            "created_by": cuser.select("a")[-1].get_text(),
+            "created_at": re.search(r"time_(\d+)", " ".join(codate.get("class"))).group(1),
+            "source_ele": post.select_one("div.content"),
+        })
+    return posts
+
+
+def measure(parse, bodies: list[str], rounds: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for body in bodies:
+            parse(0, body)
+    elapsed = (time.perf_counter() - start) / (rounds * len(bodies))
+    # 内存峰值：一轮中所有讨论帖的解析结果同时存活
+    tracemalloc.start()
+    kept = [parse(0, body) for body in bodies]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del kept
+    return elapsed, peak
+
+
+def main():
+    if len(sys.argv) > 1:
+        bodies = []
+        for path in sys.argv[1:]:
+            with open(path, encoding="utf-8") as file:
+                bodies.append(file.read())
+    else:
+        bodies = [fake_thread() for _ in range(20)]
+    rounds = 5
+    soup_time, soup_peak = measure(parse_soup, bodies, rounds)
+    lxml_time, lxml_peak = measure(parse_posts, bodies, rounds)
+    print(f"bs4     {soup_time * 1000:.2f}ms/页 峰值{soup_peak / 1024:.0f}KiB")
+    print(f"lxml    {lxml_time * 1000:.2f}ms/页 峰值{lxml_peak / 1024:.0f}KiB")
+    print(f"加速{soup_time / lxml_time:.1f}倍，内存峰值降低{1 - lxml_peak / soup_peak:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# 在模拟的AMC端点上对比不同并发数下检查流程的耗时
+# 用法：python benchmarks/bench_pipeline.py [页面数] [模拟延迟毫秒]
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from amc_client import AMCClient  # noqa: E402
+from governor import governor  # noqa: E402
+from bench_amc_pool import StandInHandler, fake_site  # noqa: E402
+from pipeline import Outbox, bind_outbox, merge_results, outbox, process_pages  # noqa: E402
+
+DELAY = 0.05
+
+
+class SlowHandler(StandInHandler):
+    def do_POST(self):
+        time.sleep(DELAY)
+        super().do_POST()
+
+
+def run(client: AMCClient, pages: list[int], concurrency: int) -> tuple[float, Outbox]:
+    site = fake_site()
+
+    def handle(page_id: int):
+        # get_discuss_id -> get_posts -> edit_post -> edit_tags
+        for step in ("discuss", "posts", "edit_post", "edit_tags"):
+            client.request(site, [{"moduleName": "Empty", "step": step, "pageId": page_id}])
+        if page_id % 3 == 0:
+            outbox().pending_delete_pages[page_id] = {"link": page_id}
+        if page_id % 7 == 0:
+            outbox().deviant[("edit_tags", page_id)] = {"pageId": page_id}
+
+    cycle = Outbox()
+    bind_outbox(cycle)
+    start = time.perf_counter()
+    merge_results(process_pages(pages, handle, concurrency))
+    return time.perf_counter() - start, cycle
+
+
+def main():
+    global DELAY
+    # 基准测试不限速
+    governor.configure(rate=float("inf"), burst=float("inf"))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    DELAY = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = AMCClient(max_connections=64, max_keepalive_connections=64,
+                       base_url=f"http://127.0.0.1:{server.server_address[1]}")
+    pages = list(range(count))
+    baseline = None
+    try:
+        for concurrency in (1, 4, 16, 64):
+            elapsed, cycle = run(client, pages, concurrency)
+            result = (list(cycle.pending_delete_pages.values()), list(cycle.deviant.values()))
+            if baseline is None:
+                baseline = result
+            print(
+                f"concurrency={concurrency:<3} {elapsed:.2f}s "
+                f"{count / elapsed:.1f} pages/s deterministic={result == baseline}"
+            )
+    finally:
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# 对比逐次re.search的倒计时解析与timer_parser（预编译正则与按内容缓存）的耗时，解析结果由tests/test_timer_parser.py检查
+# 用法：python benchmarks/bench_timer_parser.py [每轮删除宣告数]
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from timer_parser import parse_announcement  # noqa: E402
+
+# (帖子内容, 倒计时链接)，覆盖已知的各种删除宣告格式
+FIXTURES = [
+    ("由于条目的分数为-5分，现根据删除政策，宣告将删除此页：",
+     "https://timer.backroomswiki.cn/timer/time=1700000000123.456/type=delete"),
+    ("由于条目的分数为 -12 分，且距离发布时间已满1个月，现根据删除政策，宣告将删除此页：",
+     "https://timer.backroomswiki.cn/timer/time=2023-11-14T22:13:20.000Z/type=delete"),
+    ("由于翻译质量不佳，宣告删除。",
+     "https://timer.backroomswiki.cn/timer/time=1700000000000/type=delete"),
+    ("本页分数为-3分，倒计时结束后删除。",
+     "https://arandintday.github.io/timer/?timestamp=1700000000000&type=delete"),
+    ("【分数回升，倒计时停止】", None),
+    ("宣告将删除此页：", "https://example.com/timer/1700000000"),
+]
+
+
+def parse_inline(text: str, timer_link: str | None):
+    # 原实现：每次调用时逐个判断并即时编译正则
+    if "分数回升" in text:
+        return ("recovered", None, None)
+    timer_link = timer_link or ""
+    if "arandintday.github.io" in timer_link:
+        deadline = float(re.search(r"timestamp=(\d+)", timer_link).group(1)) / 1000
+    elif "timer.backroomswiki.cn" in timer_link:
+        if ".000Z" in timer_link:
+            deadline = datetime.fromisoformat(re.search(r"/time=(.*?)\.000Z", timer_link).group(1)).timestamp()
+        else:
+            deadline = float(re.search(r"/time=(\d+)", timer_link).group(1)) / 1000
+    else:
+        deadline = None
+    if "翻译" in text:
+        return ("translate", deadline, None)
+    matches = re.search(r"分数为 ?(-?\d+) ?分", text)
+    return ("normal", deadline, int(matches.group(1)) if matches is not None else None)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    # 每轮检查中大部分删除宣告与上一轮相同
+    posts = []
+    for i in range(count):
+        text, link = FIXTURES[i % len(FIXTURES)]
+        posts.append((f"{text}<!--{i % 200}-->", link))
+    rounds = 10
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, link in posts:
+            parse_inline(text, link)
+    inline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, link in posts:
+            parse_announcement(text, link)
+    cached = time.perf_counter() - start
+
+    print(f"逐次解析   {inline / (rounds * count) * 1e6:.2f}us/帖")
+    print(f"timer_parser {cached / (rounds * count) * 1e6:.2f}us/帖 {parse_announcement.cache_info()}")
+    print(f"加速{inline / cached:.1f}倍")
+
+
+if __name__ == "__main__":
+    main()
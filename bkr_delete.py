@@ -1,89 +1,49 @@
-import asyncio
-from datetime import datetime
-import json
+import itertools
 import logging
-import pickle
-import re
 import sys
 import time
 import traceback
-from typing import Any, Callable
-from bs4 import BeautifulSoup
+from typing import Any, Callable, Iterable, Iterator
 import httpx
-import wikidot
 from wikidot.common import exceptions
-from  wikidot.module.site import Site
-from wikidot.util.parser import odate as odate_parser
-from wikidot.util.parser import user as user_parser
-import yaml
+from wikidot.util.parser import page_source as page_source_parser
+from app import App
+from governor import Retry, governor
+from metrics import metrics
+import log_setup
+from thread_cache import ThreadState
+from forum_parser import Post, parse_edit_form, parse_posts, parse_thread_info
+from timer_parser import Announcement, parse_announcement
+from reconcile import is_active, reconcile_tags, same_announcement
+from write_batch import PendingWrite
+from work_queue import CHANGED, ROUTINE, URGENT, Budget, prioritize
+from listing import PAGE_FIELDS, PageRecord, get_pages, iter_chunks, list_records, missing_pages
+from pipeline import Outbox, bind_outbox, merge_results, outbox, process_pages
+from scheduler import snapshot
 from httpx import ConnectError, ConnectTimeout
 
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-console_handler = logging.StreamHandler()
-file_handler = logging.FileHandler(
-    f"logs/{datetime.now().strftime('%Y-%m-%d')}.txt")
-console_handler.setLevel(logging.INFO)
-file_handler.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-console_handler.setFormatter(formatter)
-file_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
-
-try:
-    with open("deleted_pages.pkl", "rb") as file:
-        pending_pages: dict[int, list] = pickle.load(file)
-except FileNotFoundError:
-    pending_pages = {}
-logger.info(f'载入历史数据：{pending_pages}')
-
-with open("config.yaml", "r", encoding="utf-8") as f:
-    config: dict = yaml.safe_load(f)
-
-deviant: list[dict] = []
-staff_unix_names: list[str] = config["staffs"]
-pending_delete_pages: list[dict] = []
-pending_check_pages: list[dict] = []
-js_result: list[dict] = []
-
-
-async def single_request(site: Site, _body: dict[str, Any]):
-    amc = site.client.amc_client
-    client = httpx.AsyncClient()
-    url = (
-        f'http{"s" if site.ssl_supported else ""}://{site.unix_name}.wikidot.com/'
-        f"ajax-module-connector.php"
-    )
-    _body["wikidot_token7"] = 123456
-    return await client.post(
-        url,
-        headers=amc.header.get_header(),
-        data=_body,
-        timeout=amc.config.request_timeout,
+
+js_result: dict[str, dict] = {}
+tagged_pages: dict[str, tuple[PageRecord, PendingWrite]] = {}
+budget = Budget()
+handled: dict[str, dict[str, tuple[Outbox, BaseException | None]]] = {}  # 本轮已处理页面的结果（阶段 -> 全名 -> 结果）
+listed_pages: dict[str, int | None] = {}  # 本轮候选列表中出现过的全部页面（全名 -> 页面id），包括不属于任何阶段的页面
+
+def setup_logging():
+    # 只在作为程序运行时创建日志文件，导入本模块不做文件操作
+    log_setup.setup_logging(
+        app.config.get("log_dir", "logs"),
+        app.config.get("log_max_mb", 50) * 1024 * 1024,
+        app.config.get("log_retention_days", 30),
+        app.config.get("log_level", "INFO"),
     )
 
+app = App(poll=lambda: poll_pages())
 
-def Retry(retry_text: str | None = None, last_text: str | None = None, times: int = 3, ifRaise: bool = False):
-    def decorator(func: Callable):
-        def wrapper(*args, **kwargs):
-            for i in range(times):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if retry_text is not None:
-                        logger.warning(retry_text)
-                    if i == times - 1:
-                        if last_text is not None:
-                            logger.error(last_text)
-                        if ifRaise:
-                            raise e
-        return wrapper
-    return decorator
-
-wd = wikidot.Client(username=config["username"], password=config["password"])
-site = wd.site.get(config["siteUnixName"])
+def amc_request(bodies: list[dict[str, Any]]) -> list[httpx.Response]:
+    return app.amc_request(bodies)
 
 @Retry(last_text="放弃重试，跳过修改")
 def edit_post(thread_id: int, post_id: int, title: str | None = None, source: str | None = None):
@@ -91,16 +51,15 @@ def edit_post(thread_id: int, post_id: int, title: str | None = None, source: st
         logger.info("标题与源代码为空，放弃修改")
         return
 
-    response = asyncio.run(
-        single_request(
-            site,
+    response = amc_request(
+        [
             {
                 "postId": post_id,
                 "threadId": thread_id,
                 "moduleName": "forum/sub/ForumEditPostFormModule"
             }
-        )
-    )
+        ]
+    )[0]
 
     error_dict = {
         "threadId": thread_id,
@@ -109,26 +68,21 @@ def edit_post(thread_id: int, post_id: int, title: str | None = None, source: st
         "source": source,
         "errorType": "edit_post_unknown",
     }
+    error_key = ("edit_post", post_id)
     status = response.json()["status"]
     if status == "no_permission":
         error_dict["errorType"] = "edit_post_permission"
-        deviant.append(error_dict)
+        outbox().deviant[error_key] = error_dict
         logger.warning("缺少编辑权限，跳过修改")
         return
     elif status == "ok":
-        if error_dict in deviant:
-            deviant.remove(error_dict)
+        outbox().deviant.pop(error_key, None)
     else:
-        logger.warning(f"编辑失败，状态为{status}，准备重试")
-        if error_dict not in deviant:
-            deviant.append(error_dict)
-        raise exceptions.WikidotStatusCodeException(status_code=status)
+        logger.warning("编辑失败，状态为%s，准备重试", status)
+        outbox().deviant[error_key] = error_dict
+        raise exceptions.WikidotStatusCodeException(f"编辑失败，状态为{status}", status)
 
-    html = BeautifulSoup(response.json()["body"], "lxml")
-    current_id = int(html.select(
-        "form#edit-post-form>input")[1].get("value"))
-    current_title = html.select_one("input#np-title").get("value")
-    current_source = html.select_one("textarea#np-text").get_text()
+    current_id, current_title, current_source = parse_edit_form(response.json()["body"])
 
     if current_title == title and current_source == source:
         logger.info("标题与源代码和原帖相同，放弃修改")
@@ -138,19 +92,20 @@ def edit_post(thread_id: int, post_id: int, title: str | None = None, source: st
     if source is None:
         source = current_source
 
-    response = site.amc_request(
-        [
-            {
-                "postId": post_id,
-                "currentRevisionId": current_id,
-                "title": title,
-                "source": source,
-                "action": "ForumAction",
-                "event": "saveEditPost",
-                "moduleName": "Empty"
-            }
-        ]
-    )[0]
+    app.thread_cache.invalidate(thread_id)
+    return app.write_batch.add(
+        "edit_post",
+        {
+            "postId": post_id,
+            "currentRevisionId": current_id,
+            "title": title,
+            "source": source,
+            "action": "ForumAction",
+            "event": "saveEditPost",
+            "moduleName": "Empty"
+        },
+        error_dict,
+    )
 
 @Retry(last_text="放弃重试，跳过创建")
 def new_post(thread_id: int, title: str = "", source: str = "", parent_id: int = ""):
@@ -158,9 +113,8 @@ def new_post(thread_id: int, title: str = "", source: str = "", parent_id: int =
         logger.info("源代码为空，放弃创建")
         return
 
-    response = asyncio.run(
-        single_request(
-            site,
+    response = amc_request(
+        [
             {
                 "threadId": thread_id,
                 "parentId": parent_id,
@@ -170,8 +124,8 @@ def new_post(thread_id: int, title: str = "", source: str = "", parent_id: int =
                 "event": "savePost",
                 "moduleName": "Empty"
             }
-        )
-    )
+        ]
+    )[0]
 
     error_dict = {
         "threadId": thread_id,
@@ -179,52 +133,63 @@ def new_post(thread_id: int, title: str = "", source: str = "", parent_id: int =
         "source": source,
         "errorType": "new_post_unknown",
     }
+    error_key = ("new_post", thread_id)
     status = response.json()["status"]
     if status == "no_permission":
         error_dict["errorType"] = "new_post_permission"
-        deviant.append(error_dict)
+        outbox().deviant[error_key] = error_dict
         logger.warning("缺少编辑权限，跳过创建")
     elif status == "ok":
-        if error_dict in deviant:
-            deviant.remove(error_dict)
+        app.thread_cache.invalidate(thread_id)
+        outbox().deviant.pop(error_key, None)
     else:
-        logger.warning(f"编辑失败，状态为{status}，准备重试")
-        if error_dict not in deviant:
-            deviant.append(error_dict)
-        raise exceptions.WikidotStatusCodeException(status_code=status)
-
-@Retry(last_text="放弃重试，跳过修改")
-def edit_tags(page_id: int, tags: str):
-    response = site.amc_request(
-        [
-            {
-                "tags": tags,
-                "pageId": page_id,
-                "action": "WikiPageAction",
-                "event": "saveTags",
-                "moduleName": "Empty"
-            }
-        ]
-    )[0]
+        logger.warning("编辑失败，状态为%s，准备重试", status)
+        outbox().deviant[error_key] = error_dict
+        raise exceptions.WikidotStatusCodeException(f"编辑失败，状态为{status}", status)
+
+def edit_tags(page_id: int, tags: str, after: PendingWrite | None = None) -> PendingWrite:
+    # 加入批量写入队列，after为依赖的删除宣告修改，其失败时不修改标签
+    return app.write_batch.add(
+        "edit_tags",
+        {
+            "tags": tags,
+            "pageId": page_id,
+            "action": "WikiPageAction",
+            "event": "saveTags",
+            "moduleName": "Empty"
+        },
+        {
+            "pageId": page_id,
+            "tags": tags,
+            "errorType": "edit_tags_unknown",
+        },
+        after,
+    )
 
-    error_dict = {
-        "pageId": page_id,
-        "tags": tags,
-        "errorType": "edit_tags_unknown",
-    }
-    status = response.json()["status"]
-    if status == "no_permission":
-        error_dict["errorType"] = "edit_tags_permission"
-        deviant.append(error_dict)
-        logger.warning("缺少编辑权限，跳过创建")
-    elif status == "ok":
-        if error_dict in deviant:
-            deviant.remove(error_dict)
+def set_tags(page: PageRecord, add: tuple[str, ...] = (), remove: tuple[str, ...] = (), after: PendingWrite | None = None) -> PendingWrite | None:
+    # 标签已经是期望的状态时不写入
+    tags = reconcile_tags(page.tags, add, remove)
+    if tags is None:
+        logger.info("标签无变化，跳过修改")
+        governor.count("WikiPageAction/saveTags", "skipped")
+        return None
+    return edit_tags(page.id, " ".join(tags), after=after)
+
+def announce(discuss_id: int, deletion_post: Post | None, desired: Announcement) -> PendingWrite | None:
+    # 删除宣告已经是期望的内容时不读取编辑表单，也不写入
+    if desired.kind == "recovered":
+        source = "【分数回升，倒计时停止】"
+    elif desired.kind == "translate":
+        source = translate_delete(desired.deadline)
     else:
-        logger.warning(f"编辑失败，状态为{status}，准备重试")
-        if error_dict not in deviant:
-            deviant.append(error_dict)
-        raise exceptions.WikidotStatusCodeException(status_code=status)
+        source = normal_delete(desired.score, desired.deadline)
+    if deletion_post is None:
+        return new_post(discuss_id, "职员帖：删除宣告", source)
+    if same_announcement(parse_announcement(deletion_post.text, deletion_post.timer_src), desired):
+        logger.info("删除宣告无变化，跳过修改")
+        governor.count("ForumAction/saveEditPost", "skipped")
+        return None
+    return edit_post(discuss_id, deletion_post.id, source=source)
 
 def translate_delete(timer: float) -> str:  # 简写翻译删除文字
     return f"""
@@ -233,13 +198,16 @@ def translate_delete(timer: float) -> str:  # 简写翻译删除文字
 
 def normal_delete(score: int, timer: float) -> str:  # 简写正常删除文字
     return f"""
-    由于条目的分数为{score}分，{"且距离发布时间已满1个月，" if score > -2 else ""}现根据[[[deletions-policy|删除政策]]]，宣告将删除此页：
+    由于条目的分数为{score}分，{"且距离发布时间已满1个月，" if score > rules()["low_rating"] else ""}现根据[[[deletions-policy|删除政策]]]，宣告将删除此页：
     [[iframe https://timer.backroomswiki.cn/timer/time={timer*1000}/type=delete style="width: 400px; height: 65px;"]]
     如果你不是作者又想要重写该条目，请在此帖回复申请。请先取得作者的同意，并将原文的源代码复制至沙盒里。除非你是工作人员，否则请勿就申请重写以外的范围回复此帖。"""
 
 
-def get_posts(thread_id: int) -> list[dict]:
-    response = site.amc_request(
+def get_posts(thread_id: int) -> list[Post]:
+    if thread_id < 0:
+        return []  # 试运行时未创建的讨论帖
+
+    response = amc_request(
         [
             {
                 "t": thread_id,
@@ -248,51 +216,67 @@ def get_posts(thread_id: int) -> list[dict]:
         ]
     )[0]
     
-    html = BeautifulSoup(response.json()["body"], "lxml")
-    if (pagerno := html.select_one("span.pager-no")) is None:
-        pagers = 1
+    pagers, post_count = parse_thread_info(response.json()["body"])
+
+    state = app.thread_cache.get(thread_id) if app.config.get("incremental_posts", True) else None
+    if state is not None and post_count is not None and state.post_count == post_count:
+        # 帖子数未变化，直接返回缓存的职员帖
+        app.thread_cache.record(True)
+        return [state.staff_post] if state.staff_post is not None else []
+    app.thread_cache.record(False)
+
+    # 只新增了帖子时，从上次的最后一页开始读取，否则完整读取
+    if state is not None and post_count is not None and state.post_count is not None and post_count > state.post_count:
+        first_page = min(state.pagers, pagers)
     else:
-        pagers = int(re.search(r"of (\d+)", pagerno.text).group(1))
-
-    responses = site.amc_request(
+        first_page = 1
+    responses = amc_request(
         [
             {
-                "pageNo": no + 1,
+                "pageNo": no,
                 "t": thread_id,
                 "order": "",
                 "moduleName": "forum/ForumViewThreadPostsModule",
             }
-            for no in range(pagers)
+            for no in range(first_page, pagers + 1)
             ]
         )
 
     posts = []
-
     for response in responses:
-        html = BeautifulSoup(response.json()["body"], "lxml")
-        for post in html.select("div.post"):
-            cuser = post.select_one("div.info span.printuser")
-            codate = post.select_one("div.info span.odate")
-            if (parent := post.parent.get("id")) != "thread-container-posts":
-                parent_id = int(re.search(r"fpc-(\d+)", parent).group(1))
-            else:
-                parent_id = ""
-
-            posts.append({
-                "id" : int(re.search(r"post-(\d+)", post.get("id")).group(1)),
-                "thread_id" : thread_id,
-                "title" : post.select_one("div.title").text.strip(),
-                "parent_id" : parent_id,
-                "created_by" : user_parser(wd, cuser),
-                "created_at" : odate_parser(codate),
-                "source_ele" : post.select_one("div.content")
-            })
+        posts.extend(parse_posts(thread_id, response.json()["body"]))
+
+    if first_page > 1:
+        posts = [post for post in posts if post.id > state.last_post_id]
+        if state.staff_post is not None:
+            posts.insert(0, state.staff_post)
+        else:
+            state.staff_post = find_staff_post(posts)
+        state.pagers = pagers
+        state.post_count = post_count
+        state.last_post_id = max([post.id for post in posts] + [state.last_post_id])
+    else:
+        app.thread_cache.set(thread_id, ThreadState(
+            pagers,
+            post_count,
+            max((post.id for post in posts), default=0),
+            find_staff_post(posts),
+        ))
 
     return posts
 
 @Retry(ifRaise=True)
 def get_discuss_id(page_id: int) -> int:
-    response = site.amc_request(
+    if (thread_id := app.discuss_cache.get(page_id)) is not None:
+        return thread_id
+    if app.amc_client.dry_run and app.amc_client.base_url is None:
+        # 试运行时不请求createPageDiscussionThread（页面没有讨论帖时该请求会在站点上创建讨论帖），连接本地替身时仍然请求
+        # 用负数作为占位id且不写入缓存，get_posts按没有帖子处理
+        logger.info("试运行，跳过创建讨论帖")
+        governor.count("ForumAction/createPageDiscussionThread", "dry_run")
+        return -page_id
+
+    response = amc_request(
         [
             {
                 "page_id": page_id,
@@ -303,337 +287,692 @@ def get_discuss_id(page_id: int) -> int:
         ]
     )[0]
 
-    return int(response.json()["thread_id"])
+    thread_id = int(response.json()["thread_id"])
+    app.discuss_cache.set(page_id, thread_id)
+    return thread_id
 
-def find_staff_post(posts: list[dict]) -> dict:
+def find_staff_post(posts: list[Post]) -> Post | None:
     for post in posts:
-        title = post["title"]
-        user = post["created_by"].name
-        if "职员帖" in title and "删除宣告" in title and user in staff_unix_names:
+        title = post.title
+        user = post.author
+        if "职员帖" in title and "删除宣告" in title and user in app.staff_unix_names:
             return post
 
-@Retry(ifRaise=True)
-def check_original_pages():
-    pages = site.pages.search(
-        category="-reserve",
-        tags="-已归档 -管理 -作者 -待删除 -重写中 -功能 -_低分删除豁免 原创 _test -组件后端 -组件 -总览 -职员记号",
-        rating="<7"
+# 删除政策，可以在配置的rules中按站点覆盖；分数条件均为低于（<）或不高于（<=）该值，时间单位为秒
+DEFAULT_RULES: dict[str, Any] = {
+    "pending_tag": "待删除",
+    "original_tag": "原创",
+    "original_tags": ["原创", "_test"],  # 带其中任一标签的页面按原创文章处理
+    "supplement_tags": ["补充材料"],  # 发布满original_grace后不按分数删除的原创文章
+    "original_excluded": ["已归档", "管理", "作者", "待删除", "重写中", "功能", "_低分删除豁免", "组件后端", "组件", "总览", "职员记号"],
+    "translate_excluded": ["_低分删除豁免", "已归档", "功能", "管理", "作者", "待删除", "总览", "组件", "旧页面", "组件后端", "重定向", "重写中", "原创", "掩藏页", "职员记号"],
+    "deleted_excluded": ["已归档", "重写中", "职员记号"],
+    "excluded_categories": ["reserve"],  # 所有阶段都不处理的分类
+    "translate_excluded_categories": ["rate", "fragment"],
+    "deleted_category": "deleted",
+    "original_rating": 7,  # 原创文章低于该分数时，发布满original_grace后宣告删除，分数回到该值时取消删除
+    "translate_rating": 0,  # 翻译文章低于该分数时宣告删除
+    "low_rating": -2,  # 原创文章不高于该分数时不等original_grace直接宣告删除
+    "very_low_rating": -10,  # 不高于该分数时使用short_countdown
+    "urgent_rating": -30,  # 不高于该分数的页面最先处理，并直接加入生成删除宣告列表
+    "original_grace": 2678400,
+    "translate_grace": 86400,
+    "countdown": 259200,
+    "short_countdown": 86400,
+    "translate_countdown": 86400,
+}
+
+def rules() -> dict[str, Any]:
+    return {**DEFAULT_RULES, **app.config.get("rules", {})}
+
+def countdown_hours(policy: dict[str, Any], score: float, page_type: str) -> int:
+    if page_type == "translate":
+        return policy["translate_countdown"] // 3600
+    return (policy["short_countdown"] if score <= policy["very_low_rating"] else policy["countdown"]) // 3600
+
+def candidate_queries(policy: dict[str, Any] = DEFAULT_RULES) -> list[dict[str, Any]]:
+    # 候选页面的并集，每轮只列出一次，再按RULES在内存中分类
+    # 带待删除标签的页面最先列出，其中的紧急页面在列出其余页面之前处理
+    category = " ".join(f"-{name}" for name in policy["excluded_categories"]) or None
+    return [
+        {"category": category, "tags": f'+{policy["pending_tag"]}'},
+        {"category": category, "rating": f'<{max(policy["original_rating"], policy["translate_rating"])}'},
+        {"category": policy["deleted_category"]},
+    ]
+
+PENDING_QUERIES = 1  # candidate_queries()中先列完再处理紧急页面的查询数
+
+# 边列出边处理的阶段，其余阶段依赖前面阶段的结果（新添加待删除标签的页面），列完后再处理
+STREAMED_STAGES = ("original", "translate")
+
+# (阶段, 条件)，与原先各阶段的ListPages筛选条件一致，一个页面可以属于多个阶段
+RULES: list[tuple[str, Callable[[PageRecord, dict[str, Any]], bool]]] = [
+    ("original", lambda page, policy: (
+        page.category not in policy["excluded_categories"] and page.rating < policy["original_rating"]
+        and set(page.tags).isdisjoint(policy["original_excluded"])
+        and not set(page.tags).isdisjoint(policy["original_tags"])
+    )),
+    ("translate", lambda page, policy: (
+        page.category not in policy["excluded_categories"] and page.category not in policy["translate_excluded_categories"]
+        and page.rating < policy["translate_rating"]
+        and set(page.tags).isdisjoint(policy["translate_excluded"])
+    )),
+    ("pending", lambda page, policy: page.category not in policy["excluded_categories"] and policy["pending_tag"] in page.tags),
+    ("deleted", lambda page, policy: page.category == policy["deleted_category"] and set(page.tags).isdisjoint(policy["deleted_excluded"])),
+]
+
+def classify(page: PageRecord, stages: set[str], policy: dict[str, Any]) -> list[str]:
+    return [stage for stage, rule in RULES if stage in stages and rule(page, policy)]
+
+def enabled_stages() -> set[str]:
+    # 各站点可以在配置中只启用部分阶段，例如没有翻译文章的站点
+    return set(app.config.get("stages", [stage for stage, _ in RULES]))
+
+def begin_listing():
+    # 完整复查时重新获取全部页面id，以免页面删除后又以同一全名重建时一直使用旧的id
+    if app.scheduler.full:
+        app.page_ids.clear()
+
+def list_candidates(
+    queries: list[dict[str, Any]],
+    pages: dict[str, list[PageRecord]],
+    streamed: dict[str, list[str]],
+    seen: set[str],
+) -> Iterator[list[tuple[str, PageRecord]]]:
+    # 逐块列出并分类，各查询的结果可能重叠，按全名去重；不属于任何阶段的页面不请求页面ID，已知页面id的页面也不再请求
+    # streamed中的阶段每块产出(阶段, 页面)立即处理，只记录全名，不保留整个列表；其余阶段的页面记入pages
+    stages = enabled_stages()
+    policy = rules()
+
+    def wanted(page: PageRecord) -> bool:
+        listed_pages.setdefault(page.fullname, None)
+        return page.fullname not in seen and bool(classify(page, stages, policy))
+
+    for query in queries:
+        for chunk in iter_chunks(app.amc_client, app.site, where=wanted, ids=app.page_ids, **query):
+            pairs = []
+            for page in chunk:
+                seen.add(page.fullname)
+                listed_pages[page.fullname] = page.id
+                for stage in classify(page, stages, policy):
+                    if stage in streamed:
+                        streamed[stage].append(page.fullname)
+                        pairs.append((stage, page))
+                    else:
+                        pages[stage].append(page)
+            yield pairs
+
+def finish_listing(pages: dict[str, list[PageRecord]], streamed: dict[str, list[str]]):
+    for fullname in [fullname for fullname in app.page_ids if fullname not in listed_pages]:
+        del app.page_ids[fullname]  # 已不在候选列表中的页面
+    counts = {**{stage: len(names) for stage, names in streamed.items()}, **{stage: len(found) for stage, found in pages.items() if stage not in streamed}}
+    logger.info("，".join(f"{stage}：{count}个页面" for stage, count in counts.items()))
+
+def poll_pages() -> list[tuple[str, tuple]]:
+    # 只取判断是否变化所需的字段
+    fields = ["fullname", "rating", "tags", "_tags", "revisions"]
+    records = [record for query in candidate_queries(rules()) for record in list_records(app.amc_client, app.site, fields, **query)]
+    return [
+        (record["fullname"], snapshot(record["rating"] or 0, f'{record["tags"]} {record["_tags"]}'.split(), record["revisions"] or 0))
+        for record in records
+    ]
+
+def page_priority(stage: str, page: PageRecord, expiring: set[int], urgent_rating: float) -> int:
+    if page.id in expiring or page.rating <= urgent_rating:
+        return URGENT
+    if app.scheduler.changed(stage, page.fullname):
+        return CHANGED
+    return ROUTINE
+
+def stage_queue(stage: str, pages: list[PageRecord]) -> list[tuple[int, PageRecord]]:
+    # 只处理发生变化、定时到期或首次出现且本轮尚未处理的页面，其余页面沿用上一次的结果
+    # 按紧急程度排序：到期或即将到期的倒计时与urgent_rating分以下的页面最先处理
+    done = handled.get(stage, {})
+    expiring = set(app.pending_pages.expiring(time.time() + app.config.get("urgent_window", 3600)))
+    urgent_rating = rules()["urgent_rating"]
+    return prioritize(
+        (page for page in pages if page.fullname not in done and app.scheduler.wants(stage, page.fullname)),
+        lambda page: page_priority(stage, page, expiring, urgent_rating),
     )
 
-    for page in pages:
-        current_time = time.time()
-        created_time = page.created_at.timestamp()
-
-        if pending_pages.get(page.id) is not None:
-            logger.info("移除pending_pages中的数据")
-            del pending_pages[page.id]
-        
-        if current_time - created_time >= 2678400 and "补充材料" not in page.tags:
-            expected_time = 259200
-        elif page.rating <= -2:
-            expected_time = 259200 if page.rating > -10 else 86400
-        else:
-            logger.info(f"页面分数为{page.rating}，不满足删除条件，跳过此页面")
-            continue
-        
-        discuss_id = get_discuss_id(page.id)
-        deletion_post = find_staff_post(get_posts(discuss_id))
-        post_source = normal_delete(page.rating, current_time + expected_time)
-        if deletion_post is None:
-            new_post(discuss_id,
-                     "职员帖：删除宣告",
-                     post_source
-                     )
-        else:
-            edit_post(discuss_id,
-                      deletion_post["id"],
-                      source=post_source
-                      )
+def handle_page(stage: str, page: PageRecord, handler: Callable):
+    with log_setup.log_context(stage, f"{page.fullname}#{page.id}"):
+        start = time.perf_counter()
+        try:
+            return handler(page)
+        finally:
+            logger.info("处理完成，耗时%.2fs", time.perf_counter() - start)
+
+def handle_pages(stage: str, queue: list[tuple[int, PageRecord]], handler: Callable) -> set[str]:
+    # 结果记入handled；本轮预算用完后只处理紧急页面，返回留到下一轮的页面
+    deferred = set()
+
+    def handle(item: tuple[int, PageRecord]):
+        priority, page = item
+        if priority > URGENT and budget.exhausted():
+            deferred.add(page.fullname)
+            return
+        return handle_page(stage, page, handler)
+
+    results = process_pages(queue, handle, app.config.get("max_concurrency", 1), app.write_batch.flush)
+    done = handled.setdefault(stage, {})
+    for (_, page), result in zip(queue, results):
+        if page.fullname not in deferred:
+            done[page.fullname] = result
+    app.scheduler.carry(deferred)
+    return deferred
+
+def run_urgent(stage: str, pages: list[PageRecord], handler: Callable):
+    # 紧急页面不等待前面的阶段，每轮最先处理，结果在该阶段正常运行时合并
+    queue = [item for item in stage_queue(stage, pages) if item[0] == URGENT]
+    if queue:
+        logger.info("优先处理%s个紧急页面", len(queue))
+        handle_pages(stage, queue, handler)
+
+def run_streamed(chunks: Iterable[list[tuple[str, PageRecord]]], handlers: dict[str, Callable]):
+    # 页面边列出边处理：每块按紧急程度排序后立即送入处理，不等待整个候选列表；结果记入handled
+    # 预算用完后只处理紧急页面，留到下一轮的页面下一轮按发生变化处理
+    expiring = set(app.pending_pages.expiring(time.time() + app.config.get("urgent_window", 3600)))
+    urgent_rating = rules()["urgent_rating"]
+    order: list[tuple[str, str]] = []
+    deferred = set()
+
+    def items():
+        for pairs in chunks:
+            queue = prioritize(
+                (pair for pair in pairs if pair[1].fullname not in handled.get(pair[0], {}) and app.scheduler.wants(pair[0], pair[1].fullname)),
+                lambda pair: page_priority(pair[0], pair[1], expiring, urgent_rating),
+            )
+            for priority, (stage, page) in queue:
+                order.append((stage, page.fullname))
+                yield priority, stage, page
+
+    def handle(item: tuple[int, str, PageRecord]):
+        priority, stage, page = item
+        if priority > URGENT and budget.exhausted():
+            deferred.add(page.fullname)
+            return
+        return handle_page(stage, page, handlers[stage])
+
+    results = process_pages(items(), handle, app.config.get("max_concurrency", 1), app.write_batch.flush)
+    for (stage, fullname), result in zip(order, results):
+        if fullname not in deferred:
+            handled.setdefault(stage, {})[fullname] = result
+    app.scheduler.carry(deferred)
+
+def run_stage(stage: str, pages: list[PageRecord], handler: Callable):
+    handle_pages(stage, stage_queue(stage, pages), handler)
+    finish_stage(stage, [page.fullname for page in pages])
+
+def finish_stage(stage: str, listed: list[str]):
+    fresh = handled.get(stage, {})
+    logger.info("%s阶段共%s个页面，其中%s个已处理", stage, len(listed), len(fresh))
+    # 出错或写操作失败（错误记录在deviant中）的页面不保存结果，下一轮重新处理，而不是等到下一次完整复查
+    app.scheduler.remember(
+        stage,
+        listed,
+        {fullname: box if e is None and not box.deviant else None for fullname, (box, e) in fresh.items()},
+    )
+    merge_results(
+        fresh[fullname] if fullname in fresh else (app.scheduler.result(stage, fullname) or Outbox(), None)
+        for fullname in listed
+    )
 
-        if deviant != [] and deviant[-1]["postId"] == deletion_post["id"]:
-            continue
-        edit_tags(page.id, " ".join(page.tags) + " 待删除")
+def mark_pending(page: PageRecord, write: PendingWrite | None):
+    # 记录添加待删除标签的页面，标签修改成功后在check_pending_pages中处理
+    if write is not None:
+        tagged_pages[page.fullname] = (page, write)
+
+def check_original_page(page):
+    policy = rules()
+    current_time = time.time()
+    created_time = page.created_at.timestamp()
+    supplement = not set(page.tags).isdisjoint(policy["supplement_tags"])
+
+    if app.pending_pages.get(page.id) is not None:
+        logger.info("移除pending_pages中的数据")
+        del app.pending_pages[page.id]
+
+    if current_time - created_time >= policy["original_grace"] and not supplement:
+        expected_time = policy["countdown"]
+    elif page.rating <= policy["low_rating"]:
+        expected_time = policy["countdown"] if page.rating > policy["very_low_rating"] else policy["short_countdown"]
+    else:
+        logger.info("页面分数为%s，不满足删除条件，跳过此页面", page.rating)
+        if not supplement:
+            app.scheduler.schedule(page.fullname, created_time + policy["original_grace"])
+        return
 
-@Retry(ifRaise=True)
-def check_translate_pages():
-    pages = site.pages.search(
-        category="-rate -fragment -reserve",
-        tags="-_低分删除豁免 -已归档 -功能 -管理 -作者 -待删除 -总览 -组件 -旧页面  -组件后端 -重定向 -重写中 -原创 -掩藏页 -职员记号", 
-        rating="<0"
-    )
+    discuss_id = get_discuss_id(page.id)
+    deletion_post = find_staff_post(get_posts(discuss_id))
+    desired = Announcement("normal", current_time + expected_time, page.rating)
+    if deletion_post is not None:
+        # 上次已发布但标签未添加成功的删除宣告仍在倒计时，沿用原来的截止时间
+        current = parse_announcement(deletion_post.text, deletion_post.timer_src)
+        if is_active(current, current_time) and current.kind == "normal" and current.score == page.rating:
+            desired = current
+    write = announce(discuss_id, deletion_post, desired)
+
+    if outbox().deviant:  # 删除宣告发布失败时不添加标签
+        return
+    mark_pending(page, set_tags(page, add=(policy["pending_tag"],), after=write))
 
-    for page in pages:
-        current_time = time.time()
-        created_time = page.created_at.timestamp()
 
-        if current_time - created_time < 86400:
-            logger.info("不满足删除条件，跳过此页面")
-            continue
-        
-        for target_site_name in config["sites"]:
-            target_site = wd.site.get(target_site_name)
-            if target_site.page.get(page.name, False) is not None:
-                break
-        else:
-            edit_tags(page.id, " ".join(page.tags) + " 原创")
-            logger.info("判断为原创页面，补充原创标签")
-            continue
-        
-        if pending_pages.get(page.id) is not None:
-            logger.info("移除pending_pages中的数据")
-            del pending_pages[page.id]
-
-        discuss_id = get_discuss_id(page.id)
-        deletion_post = find_staff_post(get_posts(discuss_id))
-        post_source = translate_delete(current_time + 86400)
-        if deletion_post is None:
-            new_post(discuss_id,
-                     "职员帖：删除宣告",
-                     post_source
-                     )
-        else:
-            edit_post(discuss_id,
-                      deletion_post["id"],
-                      source=post_source
-                      )
+def check_translate_page(page):
+    policy = rules()
+    current_time = time.time()
+    created_time = page.created_at.timestamp()
 
-        if deviant != [] and deviant[-1]["postId"] == deletion_post["id"]:
-            continue
-        edit_tags(page.id, " ".join(page.tags) + " 待删除")
+    if current_time - created_time < policy["translate_grace"]:
+        logger.info("不满足删除条件，跳过此页面")
+        app.scheduler.schedule(page.fullname, created_time + policy["translate_grace"])
+        return
 
-@Retry(ifRaise=True)
-def check_pending_pages():
-    pages = site.pages.search(
-        category="-reserve",
-        tags="+待删除"
-    )
+    if page.name not in app.sister_index:
+        set_tags(page, add=(policy["original_tag"],))
+        logger.info("判断为原创页面，补充原创标签")
+        return
 
-    for page in pages:
-        current_time = time.time()
-        created_time = page.created_at.timestamp()
-        discuss_id = get_discuss_id(page.id)
-        deletion_post = find_staff_post(get_posts(discuss_id))
-        tags = page.tags
-        original = "原创" in tags
-
-        if "职员标记" in tags and original:
-            logger.info("原创文章具有职员标记，跳过判断")
-            continue
+    if app.pending_pages.get(page.id) is not None:
+        logger.info("移除pending_pages中的数据")
+        del app.pending_pages[page.id]
 
-        if deletion_post is not None:
-            source = deletion_post["source_ele"]
-            if "分数回升" in source.text:
-                edit_tags(page.id, " ".join(page.tags).replace("待删除", ""))
-                logger.info("检测到删除宣告内容为分数回升，跳过页面")
-                continue
-            
-            timer_link = source.select_one("iframe").get("src")
-            if "arandintday.github.io" in timer_link:
-                record_timestamp = float(
-                    re.search(r"timestamp=(\d+)", timer_link).group(1)) / 1000
-            elif "timer.backroomswiki.cn" in timer_link:
-                if ".000Z" in timer_link:
-                    record_timestamp = datetime.fromisoformat(
-                        re.search(r"/time=(.*?)\.000Z", timer_link).group(1)).timestamp()
-                else:
-                    record_timestamp = float(
-                        re.search(r"/time=(\d+)", timer_link).group(1)) / 1000
-            else:
-                logger.warning("未找到时间戳")
-                continue
-            logger.info(f"删除宣告时间戳为{record_timestamp}")
-
-            if "翻译" in source.text:
-                logger.debug('检测到删除宣告为翻译文章')
-                if original:
-                    logger.info('文章为原创文章但使用翻译文章的删除宣告，准备重置删除宣告')
-                    record_timestamp = current_time + 259200
-                    edit_post(discuss_id, deletion_post["id"], source=normal_delete(
-                        page.rating, record_timestamp))
-                    page_score = -2 if page.rating < -10 else page.rating
-                else:
-                    page_score = page.rating if page.id not in pending_pages else pending_pages[page.id][0]
+    discuss_id = get_discuss_id(page.id)
+    deletion_post = find_staff_post(get_posts(discuss_id))
+    desired = Announcement("translate", current_time + policy["translate_countdown"], None)
+    if deletion_post is not None:
+        current = parse_announcement(deletion_post.text, deletion_post.timer_src)
+        if is_active(current, current_time) and current.kind == "translate":
+            desired = current
+    write = announce(discuss_id, deletion_post, desired)
+
+    if outbox().deviant:  # 删除宣告发布失败时不添加标签
+        return
+    mark_pending(page, set_tags(page, add=(policy["pending_tag"],), after=write))
+
+@metrics.stage("check_listed_pages")
+def check_listed_pages(chunks: Iterable[list[tuple[str, PageRecord]]], streamed: dict[str, list[str]]):
+    # 原创与翻译文章边列出边处理，列表请求的耗时也计入本阶段
+    if "translate" in streamed:
+        app.sister_index.refresh()
+    run_streamed(chunks, HANDLERS)
+    for stage, listed in streamed.items():
+        finish_stage(stage, listed)
+
+def check_pending_page(page):
+    policy = rules()
+    current_time = time.time()
+    created_time = page.created_at.timestamp()
+    discuss_id = get_discuss_id(page.id)
+    deletion_post = find_staff_post(get_posts(discuss_id))
+    tags = page.tags
+    original = policy["original_tag"] in tags
+
+    if "职员标记" in tags and original:
+        logger.info("原创文章具有职员标记，跳过判断")
+        return
+
+    if deletion_post is not None:
+        announcement = parse_announcement(deletion_post.text, deletion_post.timer_src)
+        if announcement.kind == "recovered":
+            set_tags(page, remove=(policy["pending_tag"],))
+            logger.info("检测到删除宣告内容为分数回升，跳过页面")
+            return
+
+        if announcement.deadline is None:
+            logger.warning("未找到时间戳，倒计时链接为%s", deletion_post.timer_src)
+            return
+        record_timestamp = announcement.deadline
+        logger.info("删除宣告时间戳为%s", record_timestamp)
+
+        if announcement.kind == "translate":
+            logger.debug('检测到删除宣告为翻译文章')
+            if original:
+                logger.info('文章为原创文章但使用翻译文章的删除宣告，准备重置删除宣告')
+                record_timestamp = current_time + policy["countdown"]
+                announce(discuss_id, deletion_post, Announcement("normal", record_timestamp, page.rating))
+                page_score = policy["low_rating"] if page.rating < policy["very_low_rating"] else page.rating
             else:
-                matches = re.search(r"分数为 ?(-?\d+) ?分", source.text)
-                if matches is None:
-                    logger.warning("未找到分数")
-                    continue
-                else:
-                    page_score = int(matches.group(1))
-            if page_score <= -10 and record_timestamp < current_time + 259200:
-                basic_timestamp = record_timestamp if page.id not in pending_pages else pending_pages[page.id][1]
+                page_score = page.rating if page.id not in app.pending_pages else app.pending_pages[page.id][0]
+        else:
+            if announcement.score is None:
+                logger.warning("未找到分数")
+                return
             else:
-                basic_timestamp = record_timestamp
-            pending_pages[page.id] = [
-                page_score,
-                basic_timestamp,
-                page.fullname
-            ]
-            logger.info(f'{page.get_url()}的页面信息保存完成')
+                page_score = announcement.score
+        if page_score <= policy["very_low_rating"] and record_timestamp < current_time + policy["countdown"]:
+            basic_timestamp = record_timestamp if page.id not in app.pending_pages else app.pending_pages[page.id][1]
         else:
-            edit_tags(page.id, " ".join(page.tags).replace("待删除", ""))
-            logger.warning("未找到删除帖")
-            continue
-        
-        if "职员记号" in tags:
-            logger.info("检测到职员记号跳过判断")
-        elif (
-            page.rating > -2 and current_time - created_time < 2678400 and original
-            or page.rating >= 7
-            or not original and page.rating >= 0
-        ):
-            edit_post(
-                discuss_id,
-                deletion_post["id"],
-                source="【分数回升，倒计时停止】"
-            )
-            del pending_pages[page.id]
-            edit_tags(page.id, " ".join(page.tags).replace("待删除", ""))
-            logger.info('文章分数回升，取消删除并删除页面信息')
-        elif pending_pages[page.id][0] <= -10 and page.rating > -10 and original:
-            logger.info(f'将文章{page.get_url()}的删除宣告倒计时从24小时修改为72小时，当前分数为{page.rating}')
-            pending_pages[page.id][0] = page.rating
-            edit_post(
-                discuss_id,
-                deletion_post["id"],
-                source=normal_delete(page.rating, record_timestamp := pending_pages[page.id][1])
-            )
-        elif (page.rating <= -10 
-              and pending_pages[page.id][0] > -10 
-              and pending_pages[page.id][1] - current_time > 86400 
-              and original):
-            logger.info(f'将文章{page.get_url()}的删除宣告倒计时从72小时修改为24小时，当前分数为{page.rating}')
-            pending_pages[page.id][0] = page.rating
-            edit_post(
-                discuss_id,
-                deletion_post["id"],
-                source=normal_delete(page.rating, record_timestamp := current_time + 86400))
-        if current_time >= record_timestamp:
-            logger.info('倒计时到期，加入生成删除宣告列表')
-            pending_check_pages.append(
-                [
-                    page.fullname,
-                    pending_pages[page.id][0],
-                    "normal" if original else "translate",
-                ]
-            )
-        elif page.id in pending_pages:
-            logger.info('倒计时未到期，加入等待倒计时文章列表')
-            pending_delete_pages.append(
-                {
-                    "link": page.get_url(),
-                    "title": page.title,
-                    "score": page.rating,
-                    "release_score": page_score,
-                    "time": 72 if page_score > -10 else 24,
-                    "discuss_link": f"https://{config["siteUnixName"]}.wikidot.com/forum/t-{discuss_id}",
-                    "post_id": deletion_post["id"],
-                    "isOriginal": original,
-                    "timestamp": record_timestamp,
-                }
-            )
-        if page.rating <= -30:
-            logger.info('文章已处于-30分以下，加入生成删除宣告列表')
-            pending_check_pages.append(
-                [page.fullname, pending_pages[page.id][0], "minusThirty"]
-            )
-
-@Retry(ifRaise=True)
-def check_deleted_pages():
-    pages = site.pages.search(
-        category="deleted",
-        tags="-已归档 -重写中 -职员记号"
-    )
+            basic_timestamp = record_timestamp
+        app.pending_pages[page.id] = [
+            page_score,
+            basic_timestamp,
+            page.fullname
+        ]
+        logger.info('%s的页面信息保存完成', page.get_url())
+    else:
+        set_tags(page, remove=(policy["pending_tag"],))
+        logger.warning("未找到删除帖")
+        return
 
-    for page in pages:
-        pending_check_pages.append([page.fullname, page.rating, "deleted"])
+    if "职员记号" in tags:
+        logger.info("检测到职员记号跳过判断")
+    elif (
+        page.rating > policy["low_rating"] and current_time - created_time < policy["original_grace"] and original
+        or page.rating >= policy["original_rating"]
+        or not original and page.rating >= policy["translate_rating"]
+    ):
+        announce(discuss_id, deletion_post, Announcement("recovered", None, None))
+        del app.pending_pages[page.id]
+        set_tags(page, remove=(policy["pending_tag"],))
+        logger.info('文章分数回升，取消删除并删除页面信息')
+    elif app.pending_pages[page.id][0] <= policy["very_low_rating"] and page.rating > policy["very_low_rating"] and original:
+        logger.info('将文章%s的删除宣告倒计时从%s小时修改为%s小时，当前分数为%s', page.get_url(), policy["short_countdown"] // 3600, policy["countdown"] // 3600, page.rating)
+        app.pending_pages[page.id] = [page.rating, *app.pending_pages[page.id][1:]]
+        announce(discuss_id, deletion_post, Announcement("normal", record_timestamp := app.pending_pages[page.id][1], page.rating))
+    elif (page.rating <= policy["very_low_rating"] 
+          and app.pending_pages[page.id][0] > policy["very_low_rating"] 
+          and app.pending_pages[page.id][1] - current_time > policy["short_countdown"] 
+          and original):
+        logger.info('将文章%s的删除宣告倒计时从%s小时修改为%s小时，当前分数为%s', page.get_url(), policy["countdown"] // 3600, policy["short_countdown"] // 3600, page.rating)
+        app.pending_pages[page.id] = [page.rating, *app.pending_pages[page.id][1:]]
+        announce(discuss_id, deletion_post, Announcement("normal", record_timestamp := current_time + policy["short_countdown"], page.rating))
+    if current_time >= record_timestamp:
+        logger.info('倒计时到期，加入生成删除宣告列表')
+        page_type = "normal" if original else "translate"
+        outbox().pending_check_pages[(page.fullname, page_type)] = [
+            page.fullname,
+            app.pending_pages[page.id][0],
+            page_type,
+        ]
+    elif page.id in app.pending_pages:
+        logger.info('倒计时未到期，加入等待倒计时文章列表')
+        app.scheduler.schedule(page.fullname, record_timestamp)
+        outbox().pending_delete_pages[page.id] = {
+            "link": page.get_url(),
+            "title": page.title,
+            "score": page.rating,
+            "release_score": page_score,
+            "time": countdown_hours(policy, page_score, "normal"),
+            "discuss_link": f"https://{app.config["siteUnixName"]}.wikidot.com/forum/t-{discuss_id}",
+            "post_id": deletion_post.id,
+            "isOriginal": original,
+            "timestamp": record_timestamp,
+        }
+    if page.rating <= policy["urgent_rating"]:
+        logger.info('文章已处于%s分以下，加入生成删除宣告列表', policy["urgent_rating"])
+        outbox().pending_check_pages[(page.fullname, "minusThirty")] = [
+            page.fullname, app.pending_pages[page.id][0], "minusThirty"
+        ]
 
-@Retry(ifRaise=True)
+@metrics.stage("check_pending_pages")
+def check_pending_pages(pages: list[PageRecord]):
+    # 本轮刚添加待删除标签的页面直接接着检查，不再重新列出；试运行时标签与删除宣告并未修改，不加入
+    listed = {page.fullname for page in pages}
+    for page, write in tagged_pages.values():
+        if write.ok and not app.amc_client.dry_run and page.fullname not in listed:
+            page.tags = write.body["tags"].split()
+            pages.append(page)
+    run_stage("pending", pages, check_pending_page)
+
+@metrics.stage("check_urgent_pages")
+def check_urgent_pages(pages: list[PageRecord]):
+    # 到期的倒计时属于最后的待删除阶段，没有预算限制时也不必等原创与翻译文章全部处理完
+    run_urgent("pending", pages, check_pending_page)
+
+def check_deleted_page(page):
+    outbox().pending_check_pages[(page.fullname, "deleted")] = [page.fullname, page.rating, "deleted"]
+
+@metrics.stage("check_deleted_pages")
+def check_deleted_pages(pages: list[PageRecord]):
+    run_stage("deleted", pages, check_deleted_page)
+
+# 各阶段中处理单个页面的函数，单独重新检查页面时使用
+HANDLERS: dict[str, Callable] = {
+    "original": check_original_page,
+    "translate": check_translate_page,
+    "pending": check_pending_page,
+    "deleted": check_deleted_page,
+}
+
+@metrics.stage("check_pending_delete_pages")
 def check_pending_delete_pages():
-    for page_id in list(pending_pages.keys()):
-        if site.page.get(pending_pages[page_id][2], False) is None:
-            del pending_pages[page_id]
-
-@Retry(ifRaise=True)
+    # 待删除页面几乎都在本轮的候选列表中，按集合判断是否存在，只有列表中没有的页面才单独确认
+    entries = {page_id: app.pending_pages[page_id][2] for page_id in list(app.pending_pages.keys())}
+    missing = missing_pages(app.amc_client, app.site, entries.values(), listed_pages)
+    for page_id, fullname in entries.items():
+        if fullname in missing:
+            del app.pending_pages[page_id]
+            app.discuss_cache.invalidate(page_id)
+    logger.info("共%s个待删除页面，%s个仍存在", len(entries), len(entries) - len(missing))
+
+def get_sources(pages: list[PageRecord]) -> dict[int, str]:
+    # 修订次数未变化的页面直接使用缓存，其余页面一次性批量获取源代码
+    sources = {}
+    missing = []
+    for page in pages:
+        if (source := app.source_cache.get(page.id, page.revisions)) is not None:
+            sources[page.id] = source
+        else:
+            missing.append(page)
+    if missing:
+        logger.info('获取%s个页面的源代码', len(missing))
+        responses = amc_request([{"moduleName": "viewsource/ViewSourceModule", "page_id": page.id} for page in missing])
+        for page, response in zip(missing, responses):
+            source = page_source_parser(response.json()["body"])
+            if source is None:
+                raise exceptions.NoElementException(f"未找到{page.fullname}的源代码")
+            sources[page.id] = source.strip().removeprefix("\t")
+            app.source_cache.set(page.id, page.revisions, sources[page.id])
+    return sources
+
+@metrics.stage("generate_announce")
 def generate_announce():
-    for page_info in pending_check_pages:
-        index = -1
+    policy = rules()
+    candidates = outbox().pending_check_pages.values()
+    fullnames = list(dict.fromkeys(page_info[0] for page_info in candidates))
+    pages = dict(zip(fullnames, get_pages(app.amc_client, app.site, fullnames, PAGE_FIELDS + ["revisions"], ids=app.page_ids)))
+    sources = get_sources([page for page in pages.values() if page is not None])
+    for page_info in candidates:
         unix_name, release_score, page_type = page_info
-        page = site.page.get(unix_name)
-        logger.info(f'正在生成{unix_name}的删除宣告')
-        for j, value in enumerate(js_result):
-            if value["link"] == page.get_url():
-                index = j
-                break
-        if index == -1:
-            js_result.append(
-                {
-                    "link": page.get_url(),
-                    "title": page.title,
-                    "score": page.rating,
-                    "time": (
-                        24 if release_score <= -10 or page_type == "translate" else 72
-                    ),
-                    "context": page.source.wiki_text,
-                    "page_type": [page_type],
-                    "release_score": release_score,
-                }
-            )
+        page = pages[unix_name]
+        if page is None:
+            logger.warning('%s已不存在，跳过', unix_name)
+            continue
+        logger.info('正在生成%s的删除宣告', unix_name)
+        link = page.get_url()
+        if link not in js_result:
+            js_result[link] = {
+                "link": link,
+                "title": page.title,
+                "score": page.rating,
+                "time": countdown_hours(policy, release_score, page_type),
+                "context": sources[page.id],
+                "page_type": [page_type],
+                "release_score": release_score,
+            }
         else:
-            if page_type not in js_result[index]["page_type"]:
-                js_result[index]["page_type"] += [page_type]
-            logger.info(f'当前页面类型为{js_result[index]["page_type"]}')
+            if page_type not in js_result[link]["page_type"]:
+                js_result[link]["page_type"] += [page_type]
+            logger.info('当前页面类型为%s', js_result[link]["page_type"])
 
 def main():
-    global deviant, js_result, pending_check_pages, pending_delete_pages
-    deviant = [] # 错误信息
-    js_result = []  # 自删页面，低分翻译页面-30，以下页面，-30~+7页面相关信息
-    pending_check_pages = [] # 待生成页面
-    pending_delete_pages = [] # 在倒计时中的页面
-    logger.info('开始为原创文章添加待删除标签')
-    check_original_pages()
-    logger.info('开始为翻译文章添加待删除标签')
-    check_translate_pages()
+    global js_result, tagged_pages, listed_pages, budget, handled
+    # deviant：错误信息，pending_check_pages：待生成页面，pending_delete_pages：在倒计时中的页面
+    cycle = Outbox()
+    bind_outbox(cycle)
+    js_result = {}  # 页面链接 -> 自删页面，低分翻译页面-30，以下页面，-30~+7页面相关信息
+    metrics.begin({"discuss": app.discuss_cache, "thread": app.thread_cache, "source": app.source_cache})
+    tagged_pages = {}
+    listed_pages = {}
+    handled = {}
+    stages = enabled_stages()
+    candidates = {stage: [] for stage, _ in RULES}
+    streamed = {stage: [] for stage in STREAMED_STAGES if stage in stages}
+    seen = set()
+    begin_listing()
+    logger.info('开始列出待删除页面')
+    queries = candidate_queries(rules())
+    with metrics.stage("list_pending"):
+        early = [pair for pairs in list_candidates(queries[:PENDING_QUERIES], candidates, streamed, seen) for pair in pairs]
+    # 预算从处理页面时开始计算，列出候选页面的请求不计入
+    budget = Budget(app.config.get("cycle_budget_seconds"), app.config.get("cycle_budget_requests"))
+    logger.info('开始处理到期的倒计时')
+    check_urgent_pages(candidates["pending"])
+    logger.info('开始列出其余页面，同时为原创与翻译文章添加待删除标签')
+    check_listed_pages(
+        itertools.chain([early], list_candidates(queries[PENDING_QUERIES:], candidates, streamed, seen)),
+        streamed,
+    )
+    finish_listing(candidates, streamed)
     logger.info('开始更新待删除文章信息')
-    check_pending_pages()
+    check_pending_pages(candidates["pending"])
     logger.info('将自删页面加入待删除列表')
-    check_deleted_pages()
+    check_deleted_pages(candidates["deleted"])
     logger.info('删除待删除页面信息中的不存在页面')
     check_pending_delete_pages()
-    with open("deleted_pages.pkl", "wb") as file:
-        pickle.dump(pending_pages, file)
-        logger.debug(f'保存待删除页面信息：{pending_pages}')
+    with metrics.stage("save_state"):
+        app.pending_pages.save()
+        logger.debug('保存待删除页面信息：%r', app.pending_pages)
+        app.discuss_cache.save()
+    logger.info('讨论帖缓存命中%s次，未命中%s次，共缓存%s个页面', app.discuss_cache.hits, app.discuss_cache.misses, len(app.discuss_cache))
+    logger.info('帖子缓存命中%s次，未命中%s次', app.thread_cache.hits, app.thread_cache.misses)
     logger.info('开始检验并生成删除宣告')
     generate_announce()
+    logger.info('源代码缓存命中%s次，未命中%s次', app.source_cache.hits, app.source_cache.misses)
     logger.info('导出js文件')
-    logger.debug(pending_delete_pages, js_result, deviant)
-    with open("data.json", "w") as json_file:
-        json.dump(
-            {
-                "pre_delete_pages": pending_delete_pages,
-                "deleted_pages": js_result,
-                "errors": deviant,
-                "update_timestamp": time.time(),
-            },
-            json_file,
+    logger.debug("倒计时页面：%s，删除宣告：%s，错误：%s", cycle.pending_delete_pages, js_result, cycle.deviant)
+    summary = metrics.summary()
+    for name, stage in summary["stages"].items():
+        logger.info('%s耗时%ss，请求%s次', name, stage["seconds"], stage["requests"])
+    for endpoint, counter in summary["endpoints"].items():
+        logger.debug('%s：%s', endpoint, counter)
+    app.output.write(
+        {
+            "pre_delete_pages": list(cycle.pending_delete_pages.values()),
+            "deleted_pages": list(js_result.values()),
+            "errors": list(cycle.deviant.values()),
+            "update_timestamp": time.time(),
+            "metrics": summary,
+        }
+    )
+    if app.config.get("metrics_path"):
+        metrics.write_prometheus(app.config["metrics_path"])
+    if app.status_api is not None:
+        publish_status(cycle, summary)
+    app.scheduler.finish()
+
+def publish_status(cycle: Outbox, summary: dict):
+    countdowns = [
+        {"page_id": page_id, "score": record[0], "timestamp": record[1], "fullname": record[2]}
+        for page_id, record in ((page_id, app.pending_pages[page_id]) for page_id in list(app.pending_pages.keys()))
+    ]
+    app.status_api.publish({
+        "status": {
+            "site": app.config["siteUnixName"],
+            "update_timestamp": time.time(),
+            "pre_delete_pages": len(cycle.pending_delete_pages),
+            "deleted_pages": len(js_result),
+            "errors": len(cycle.deviant),
+            "countdowns": len(countdowns),
+            "metrics": summary,
+        },
+        "pre_delete_pages": list(cycle.pending_delete_pages.values()),
+        "deleted_pages": list(js_result.values()),
+        "errors": list(cycle.deviant.values()),
+        "countdowns": countdowns,
+    })
+
+def resolve_page(request: tuple[str, str]) -> str | None:
+    # ?page=为页面全名，直接使用；?id=为页面id，在倒计时记录与上一轮的候选列表中查找全名
+    name, value = request
+    if name == "page":
+        return value
+    if (record := app.pending_pages.get(int(value))) is not None:
+        return record[2]
+    return next((fullname for fullname, page_id in listed_pages.items() if page_id == int(value)), None)
+
+def recheck_pages(requests: list[tuple[str, str]]):
+    # 只加载并检查请求的页面，不重新列出候选页面；结果记入调度器，下一轮中页面没有变化时沿用
+    requested = {}
+    for request in requests:
+        if (fullname := resolve_page(request)) is None:
+            logger.warning("未找到页面%s=%s，忽略检查请求", *request)
+            app.status_api.report(request, "not_found")
+        else:
+            requested[request] = fullname
+    if not requested:
+        return
+    try:
+        pages = get_pages(app.amc_client, app.site, list(requested.values()), ids=app.page_ids)
+    except Exception as e:
+        for request in requested:
+            app.status_api.report(request, "failed", error=repr(e))
+        raise
+    stages = enabled_stages()
+    for (request, fullname), page in zip(requested.items(), pages):
+        if page is None:
+            logger.warning("%s已不存在，忽略检查请求", fullname)
+            app.status_api.report(request, "not_found", fullname=fullname)
+            continue
+        matched = classify(page, stages, rules())
+        if not matched:
+            logger.warning("%s不属于任何检查阶段，忽略检查请求", fullname)
+            app.status_api.report(request, "ignored", fullname=fullname)
+            continue
+        logger.info("重新检查%s：%s", fullname, "、".join(matched))
+        merged = Outbox()
+        errors = []
+        for stage in matched:
+            if stage == "translate":
+                app.sister_index.refresh()
+            [(box, e)] = process_pages([page], lambda page: handle_page(stage, page, HANDLERS[stage]), 1, app.write_batch.flush)
+            app.scheduler.update(stage, fullname, box if e is None and not box.deviant else None)
+            merged.merge(box)
+            if e is not None:
+                logger.error("重新检查%s出错：%r", fullname, e)
+                errors.append(repr(e))
+        app.status_api.report(
+            request,
+            "failed" if errors or merged.deviant else "done",
+            fullname=fullname,
+            stages=matched,
+            pre_delete_pages=list(merged.pending_delete_pages.values()),
+            deleted_pages=list(merged.pending_check_pages.values()),
+            errors=errors + list(merged.deviant.values()),
         )
 
-if __name__ == "__main__":
+def run():
     flag = 0
+    network_errors = 0
     while flag < 5:
         try:
-            logger.info('开始启动页面管理程序')
-            main()
-            logger.info('主程序运行完成')
-            time.sleep(1800)
+            if app.status_api is not None:
+                recheck_pages(app.status_api.take_requests())
+            if app.scheduler.should_run():
+                logger.info('开始启动页面管理程序')
+                main()
+                logger.info('主程序运行完成')
+            if app.status_api is not None:
+                app.status_api.wait(app.scheduler.sleep_time())
+            else:
+                time.sleep(app.scheduler.sleep_time())
             flag = 0
+            network_errors = 0
         except (ConnectError, ConnectTimeout):
-            logger.error("网络错误，1分钟后重试")
-            time.sleep(60)
+            network_errors += 1
+            wait = governor.backoff(network_errors)
+            logger.error("网络错误，%.0fs后重试", wait)
+            time.sleep(wait)
         except Exception as e:
             flag += 1
             exc_type, exc_value, exc_traceback_obj = sys.exc_info()
-            logger.error(f'第{flag}/5次重试，错误类型：{exc_type}，内容：{exc_value},3s后重试')
+            wait = governor.backoff(flag)
+            logger.error('第%s/5次重试，错误类型：%s，内容：%s,%.0fs后重试', flag, exc_type, exc_value, wait)
             traceback.print_exc()
-            time.sleep(3)
+            time.sleep(wait)
     logger.critical('多次错误致使程序退出，等待人工重新启动')
+
+if __name__ == "__main__":
+    setup_logging()
+    run()
@@ -0,0 +1,49 @@
+import pickle
+import threading
+
+from atomic_file import write_atomic
+
+
+class DiscussCache:
+    # 页面id -> 讨论帖id，讨论帖一旦创建就不会变化，命中后无需再请求createPageDiscussionThread
+    def __init__(self, path: str = "discuss_ids.pkl"):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path, "rb") as file:
+                self._threads: dict[int, int] = pickle.load(file)
+        except FileNotFoundError:
+            self._threads = {}
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+    def get(self, page_id: int) -> int | None:
+        with self._lock:
+            thread_id = self._threads.get(page_id)
+            if thread_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return thread_id
+
+    def set(self, page_id: int, thread_id: int):
+        with self._lock:
+            if self._threads.get(page_id) != thread_id:
+                self._threads[page_id] = thread_id
+                self._dirty = True
+
+    def invalidate(self, page_id: int):
+        with self._lock:
+            if self._threads.pop(page_id, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            write_atomic(self.path, pickle.dumps(self._threads))
+            self._dirty = False
@@ -0,0 +1,117 @@
+import re
+from datetime import datetime, timezone
+
+from lxml import etree, html as lxml_html
+
+
+def _class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# 预编译的XPath，只取机器人需要的部分
+POSTS = etree.XPath(f"//div[{_class('post')}]")
+TITLE = etree.XPath(f".//div[{_class('title')}]")
+AUTHOR = etree.XPath(f".//div[{_class('info')}]//span[{_class('printuser')}]")
+ODATE = etree.XPath(f".//div[{_class('info')}]//span[{_class('odate')}]/@class")
+CONTENT = etree.XPath(f".//div[{_class('content')}]")
+PAGER_NO = etree.XPath(f"//span[{_class('pager-no')}]")
+STATISTICS = etree.XPath(f"//div[{_class('statistics')}]")
+EDIT_FORM_INPUTS = etree.XPath("//form[@id='edit-post-form']/input/@value")
+EDIT_TITLE = etree.XPath("//input[@id='np-title']/@value")
+EDIT_TEXT = etree.XPath("//textarea[@id='np-text']")
+
+
+class Post:
+    # 帖子中机器人用到的字段，不保留解析树
+    __slots__ = ("id", "thread_id", "title", "parent_id", "author", "created_at", "text", "timer_src")
+
+    def __init__(self, id: int, thread_id: int, title: str, parent_id: int | str, author: str, created_at: datetime | None, text: str, timer_src: str | None):
+        self.id = id
+        self.thread_id = thread_id
+        self.title = title
+        self.parent_id = parent_id
+        self.author = author
+        self.created_at = created_at
+        self.text = text
+        self.timer_src = timer_src
+
+    def __repr__(self) -> str:
+        return f"Post({self.id}, thread_id={self.thread_id}, title={self.title!r}, author={self.author!r})"
+
+
+def _parse(body: str) -> etree._Element:
+    return lxml_html.fromstring(body or "<div></div>")
+
+
+def _author(printuser: etree._Element) -> str:
+    # 与printuser解析一致：用户名为最后一个链接的文字，已删除与匿名用户没有用户名
+    classes = (printuser.get("class") or "").split()
+    if "deleted" in classes or "anonymous" in classes or not (links := printuser.findall(".//a")):
+        return ""
+    return links[-1].text_content()
+
+
+def _created_at(classes: list[str]) -> datetime | None:
+    if classes and (matches := re.search(r"time_(\d+)", classes[0])) is not None:
+        return datetime.fromtimestamp(int(matches.group(1)), timezone.utc)
+    return None
+
+
+def _previous_text(element: etree._Element) -> str | None:
+    # 元素前一个兄弟节点的文字，前一个节点是元素时取其HTML
+    if (previous := element.getprevious()) is None:
+        return element.getparent().text
+    if previous.tail:
+        return previous.tail
+    return etree.tostring(previous, encoding=str, with_tail=False)
+
+
+def parse_posts(thread_id: int, body: str) -> list[Post]:
+    posts = []
+    for post in POSTS(_parse(body)):
+        if (parent := post.getparent().get("id")) != "thread-container-posts":
+            parent_id = int(re.search(r"fpc-(\d+)", parent).group(1))
+        else:
+            parent_id = ""
+        title = TITLE(post)
+        author = AUTHOR(post)
+        content = CONTENT(post)
+        iframe = content[0].find(".//iframe") if content else None
+        posts.append(Post(
+            int(re.search(r"post-(\d+)", post.get("id")).group(1)),
+            thread_id,
+            title[0].text_content().strip() if title else "",
+            parent_id,
+            _author(author[0]) if author else "",
+            _created_at(ODATE(post)),
+            content[0].text_content() if content else "",
+            iframe.get("src") if iframe is not None else None,
+        ))
+    return posts
+
+
+def parse_thread_info(body: str) -> tuple[int, int | None]:
+    # 返回讨论帖的分页数与帖子数，帖子数位于div.statistics中第3个br之前的文字
+    root = _parse(body)
+    pagers = 1
+    if (pager_no := PAGER_NO(root)) and (matches := re.search(r"of (\d+)", pager_no[0].text_content())) is not None:
+        pagers = int(matches.group(1))
+    post_count = None
+    if statistics := STATISTICS(root):
+        br_tags = statistics[0].findall(".//br")
+        if len(br_tags) >= 3 and (previous := _previous_text(br_tags[2])):
+            if (matches := re.search(r"(\d+)", previous)) is not None:
+                post_count = int(matches.group(1))
+    return pagers, post_count
+
+
+def parse_edit_form(body: str) -> tuple[int, str | None, str]:
+    # 返回帖子编辑表单中的当前修订id、标题与源代码
+    root = _parse(body)
+    titles = EDIT_TITLE(root)
+    text = EDIT_TEXT(root)
+    return (
+        int(EDIT_FORM_INPUTS(root)[1]),
+        titles[0] if titles else None,
+        text[0].text_content() if text else "",
+    )
@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import inspect
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable
+
+import httpx
+from wikidot.common import exceptions
+
+
+logger = logging.getLogger(__name__)
+
+# 重试也无法成功的状态，直接放弃
+PERMANENT_STATUSES = {"no_permission", "not_found"}
+
+# 默认每秒请求数与突发请求数
+DEFAULT_RATE = 5
+DEFAULT_BURST = 10
+
+
+class TokenBucket:
+    # 令牌桶限速，rate为每秒补充的令牌数，burst为桶容量
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # 预留一个令牌，返回需要等待的秒数
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class Governor:
+    # 所有请求的统一限速与重试策略，同步与异步调用方共用同一个令牌桶与计数
+    def __init__(self, **kwargs):
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "retries": 0, "throttled": 0, "failures": 0, "dry_run": 0, "skipped": 0})
+        self.configure(**kwargs)
+
+    def configure(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST, attempts: int = 5, base: float = 1.0, max_backoff: float = 60.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.attempts = attempts
+        self.base = base
+        self.max_backoff = max_backoff
+
+    def count(self, endpoint: str, key: str, n: int = 1):
+        with self._lock:
+            self._stats[endpoint][key] += n
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {endpoint: dict(counter) for endpoint, counter in self._stats.items()}
+
+    def backoff(self, attempt: int) -> float:
+        # 指数退避加全抖动
+        return random.uniform(0, min(self.max_backoff, self.base * 2 ** attempt))
+
+    def acquire(self, endpoint: str):
+        self.count(endpoint, "requests")
+        if (wait := self.bucket.reserve()) > 0:
+            self.count(endpoint, "throttled")
+            time.sleep(wait)
+
+    async def aacquire(self, endpoint: str):
+        self.count(endpoint, "requests")
+        if (wait := self.bucket.reserve()) > 0:
+            self.count(endpoint, "throttled")
+            await asyncio.sleep(wait)
+
+
+def is_retryable(e: BaseException) -> bool:
+    # 网络错误、5xx与try_again只在AMCClient._send中重试，到这里说明已经用完重试次数，外层不再叠加重试
+    if isinstance(e, (httpx.TransportError, httpx.HTTPStatusError)):
+        return False
+    if isinstance(e, (exceptions.ForbiddenException, exceptions.NotFoundException)):
+        return False
+    if isinstance(e, exceptions.WikidotStatusCodeException):
+        return e.status_code not in PERMANENT_STATUSES and e.status_code != "try_again"
+    return True
+
+
+def endpoint_of(body: dict[str, Any]) -> str:
+    if "action" in body:
+        return f'{body["action"]}/{body.get("event", "")}'
+    return body.get("moduleName", "unknown")
+
+
+governor = Governor()
+
+
+def Retry(retry_text: str | None = None, last_text: str | None = None, times: int = 3, ifRaise: bool = False):
+    # 失败后按指数退避重试，不可重试的错误立即放弃，同步与异步函数均可使用
+    # 只用于单个请求的状态与解析错误，不要嵌套使用，否则每层的重试次数会相乘
+    def decorator(func: Callable):
+        endpoint = func.__name__
+
+        def give_up(i: int, e: Exception) -> bool:
+            if not is_retryable(e) or i == times - 1:
+                if last_text is not None:
+                    logger.error(last_text)
+                governor.count(endpoint, "failures")
+                if ifRaise:
+                    raise e
+                return True
+            if retry_text is not None:
+                logger.warning(retry_text)
+            governor.count(endpoint, "retries")
+            return False
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                for i in range(times):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        if give_up(i, e):
+                            return None
+                        await asyncio.sleep(governor.backoff(i))
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for i in range(times):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if give_up(i, e):
+                        return None
+                    time.sleep(governor.backoff(i))
+        return wrapper
+    return decorator
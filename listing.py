@@ -0,0 +1,222 @@
+import re
+from datetime import datetime, timezone
+from typing import Any, Callable, Collection, Iterable, Iterator
+
+from bs4 import BeautifulSoup
+from wikidot.module.site import Site
+
+from amc_client import AMCClient
+
+
+PER_PAGE = 250
+
+LIST_DEFAULTS = {
+    "pagetype": "*",
+    "category": "*",
+    "order": "created_at desc",
+    "offset": 0,
+    "perPage": PER_PAGE,
+    "separate": "no",
+    "wrapper": "no",
+}
+
+
+def list_query(fields: list[str], **query: Any) -> dict[str, Any]:
+    # 只让ListPagesModule渲染需要的字段，减少响应体积与解析开销
+    body = {**LIST_DEFAULTS, **{key: value for key, value in query.items() if value is not None}}
+    body["moduleName"] = "list/ListPagesModule"
+    body["module_body"] = (
+        '[[div class="page"]]\n'
+        + "".join(
+            f'[[span class="set {field}"]]'
+            f'[[span class="name"]] {field} [[/span]]'
+            f'[[span class="value"]] %%{field}%% [[/span]]'
+            f"[[/span]]"
+            for field in fields
+        )
+        + "\n[[/div]]"
+    )
+    return body
+
+
+def parse_total(html: BeautifulSoup) -> int:
+    if html.select_one("div.pager") is None:
+        return 1
+    targets = html.select("div.pager span.target")
+    if len(targets) < 2 or (matches := re.search(r"\d+", targets[-2].text)) is None:
+        return 1
+    return int(matches.group())
+
+
+def parse_records(html: BeautifulSoup, fields: list[str]) -> list[dict[str, str]]:
+    records = []
+    for page in html.select("div.page"):
+        record = {}
+        for field in fields:
+            value = page.select_one(f"span.{field} span.value")
+            if value is None:
+                record[field] = ""
+            elif (odate := value.select_one("span.odate")) is not None:
+                # 时间字段取class中的时间戳，不依赖显示格式
+                matches = re.search(r"time_(\d+)", " ".join(odate.get("class", [])))
+                record[field] = matches.group(1) if matches is not None else ""
+            else:
+                record[field] = value.text.strip()
+        records.append(record)
+    return records
+
+
+def list_records(client: AMCClient, site: Site, fields: list[str], **query: Any) -> list[dict[str, str]]:
+    first = list_query(fields, **query)
+    html = BeautifulSoup(client.request(site, [first])[0].json()["body"], "lxml")
+    records = parse_records(html, fields)
+    if (total := parse_total(html)) > 1:
+        responses = client.request(
+            site,
+            [{**first, "offset": no * first["perPage"]} for no in range(1, total)],
+        )
+        for response in responses:
+            records.extend(parse_records(BeautifulSoup(response.json()["body"], "lxml"), fields))
+    return records
+
+
+def list_fullnames(client: AMCClient, site: Site, **query: Any) -> set[str]:
+    return {record["fullname"] for record in list_records(client, site, ["fullname"], **query)}
+
+
+# 检查页面时需要的字段，页面ID另外按批获取
+PAGE_FIELDS = ["fullname", "title", "rating", "tags", "_tags", "created_at"]
+
+
+class PageRecord:
+    # 列表中的一条页面记录，只包含检查时用到的字段
+    __slots__ = ("site", "id", "fullname", "title", "rating", "tags", "created_at", "revisions")
+
+    def __init__(self, site: Site, record: dict[str, str], page_id: int | None = None):
+        self.site = site
+        self.id = page_id
+        self.fullname = record["fullname"]
+        self.title = record.get("title", "")
+        self.rating = _number(record.get("rating", ""))
+        self.tags = f'{record.get("tags", "")} {record.get("_tags", "")}'.split()
+        created_at = record.get("created_at", "")
+        self.created_at = datetime.fromtimestamp(int(created_at), timezone.utc) if created_at else None
+        self.revisions = int(_number(record.get("revisions", "")))
+
+    @property
+    def category(self) -> str:
+        return self.fullname.split(":", 1)[0] if ":" in self.fullname else "_default"
+
+    @property
+    def name(self) -> str:
+        return self.fullname.split(":", 1)[-1]
+
+    def get_url(self) -> str:
+        return f"{self.site.url}/{self.fullname}"
+
+    def __repr__(self) -> str:
+        return f"PageRecord({self.fullname!r}, id={self.id})"
+
+
+def _number(value: str) -> int | float:
+    if not value:
+        return 0
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def fetch_page_ids(client: AMCClient, site: Site, fullnames: list[str]) -> list[int | None]:
+    responses = client.get(site, [f"{fullname}/norender/true/noredirect/true" for fullname in fullnames])
+    ids = []
+    for response in responses:
+        matches = re.search(r"WIKIREQUEST\.info\.pageId = (\d+);", response.text)
+        ids.append(int(matches.group(1)) if matches is not None else None)
+    return ids
+
+
+def assign_ids(client: AMCClient, site: Site, pages: list[PageRecord], ids: dict[str, int] | None = None):
+    # 页面id不会变化，ids中已有的直接使用，其余页面再单独请求并记入ids；找不到的页面id为None
+    if ids is not None:
+        for page in pages:
+            page.id = ids.get(page.fullname)
+    unknown = [page for page in pages if page.id is None]
+    if not unknown:
+        return
+    for page, page_id in zip(unknown, fetch_page_ids(client, site, [page.fullname for page in unknown])):
+        page.id = page_id
+        if ids is not None and page_id is not None:
+            ids[page.fullname] = page_id
+
+
+def list_pages(
+    client: AMCClient,
+    site: Site,
+    fields: list[str] = PAGE_FIELDS,
+    with_ids: bool = True,
+    where: Callable[[PageRecord], bool] | None = None,
+    ids: dict[str, int] | None = None,
+    **query: Any,
+) -> list[PageRecord]:
+    # where在获取页面ID之前过滤，不需要的页面不再单独请求ID
+    pages = [PageRecord(site, record) for record in list_records(client, site, fields, **query)]
+    if where is not None:
+        pages = [page for page in pages if where(page)]
+    if not with_ids:
+        return pages
+    assign_ids(client, site, pages, ids)
+    return [page for page in pages if page.id is not None]  # 列出后被移动或删除的页面没有ID
+
+
+def iter_chunks(
+    client: AMCClient,
+    site: Site,
+    fields: list[str] = PAGE_FIELDS,
+    where: Callable[[PageRecord], bool] | None = None,
+    ids: dict[str, int] | None = None,
+    **query: Any,
+) -> Iterator[list[PageRecord]]:
+    # 逐块请求列表并立即产出该块的页面，调用方可以在后续块返回前开始处理
+    # where在获取页面ID之前过滤，不需要的页面不再单独请求ID
+    first = list_query(fields, **query)
+    total = None
+    no = 0
+    while total is None or no < total:
+        html = BeautifulSoup(
+            client.request(site, [{**first, "offset": no * first["perPage"]}])[0].json()["body"], "lxml")
+        if total is None:
+            total = parse_total(html)
+        pages = [PageRecord(site, record) for record in parse_records(html, fields)]
+        if where is not None:
+            pages = [page for page in pages if where(page)]
+        assign_ids(client, site, pages, ids)
+        yield [page for page in pages if page.id is not None]  # 列出后被移动或删除的页面没有ID
+        no += 1
+
+
+def get_pages(
+    client: AMCClient,
+    site: Site,
+    fullnames: list[str],
+    fields: list[str] = PAGE_FIELDS,
+    with_ids: bool = True,
+    ids: dict[str, int] | None = None,
+) -> list[PageRecord | None]:
+    # 按页面全名一次性请求多个页面的信息，不存在的页面为None
+    responses = client.request(site, [list_query(fields, category="*", fullname=fullname) for fullname in fullnames])
+    pages = []
+    for response in responses:
+        found = parse_records(BeautifulSoup(response.json()["body"], "lxml"), fields)
+        pages.append(PageRecord(site, found[0]) if found else None)
+    if not with_ids:
+        return pages
+    assign_ids(client, site, [page for page in pages if page is not None], ids)
+    return [page if page is not None and page.id is not None else None for page in pages]
+
+
+def missing_pages(client: AMCClient, site: Site, fullnames: Iterable[str], known: Collection[str]) -> set[str]:
+    # known为本轮列表中出现过的页面，一定存在；其余页面（例如已移出候选范围）再批量确认
+    unknown = [fullname for fullname in fullnames if fullname not in known]
+    if not unknown:
+        return set()
+    pages = get_pages(client, site, unknown, ["fullname"], with_ids=False)
+    return {fullname for fullname, page in zip(unknown, pages) if page is None}
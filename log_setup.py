@@ -0,0 +1,104 @@
+import atexit
+import contextlib
+import contextvars
+import logging
+import os
+import queue
+import re
+from datetime import date, datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
+
+
+# 当前处理的阶段与页面，由run_stage设置，页面并发处理时每个线程各自的值互不影响
+_context: contextvars.ContextVar[str] = contextvars.ContextVar("log_context", default="")
+
+FORMAT = "%(asctime)s - %(levelname)s - %(context)s%(message)s"
+
+# 第三方库只记录警告以上的日志
+QUIET_LOGGERS = ("httpx", "httpcore", "wikidot", "asyncio")
+
+
+@contextlib.contextmanager
+def log_context(stage: str, page: str):
+    token = _context.set(f"[{stage} {page}] ")
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    # 在产生日志的线程中取出上下文，写入日志的线程中已经取不到
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.context = _context.get()
+        return True
+
+
+class DailyFileHandler(logging.FileHandler):
+    # 按日期写入logs/<日期>.txt，跨过零点时自动切换文件
+    # 单个文件超过max_bytes时续写<日期>.1.txt、<日期>.2.txt，超过retention_days天的文件会被删除
+    def __init__(self, directory: str = "logs", max_bytes: int = 50 * 1024 * 1024, retention_days: int = 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        os.makedirs(directory, exist_ok=True)
+        self.day = date.today()
+        self.part = 0
+        super().__init__(self._path(), encoding="utf-8", delay=True)
+        self.prune()
+
+    def _path(self) -> str:
+        suffix = f".{self.part}" if self.part else ""
+        return os.path.join(self.directory, f"{self.day.strftime('%Y-%m-%d')}{suffix}.txt")
+
+    def _switch(self, day: date, part: int):
+        self.close()
+        self.day = day
+        self.part = part
+        self.baseFilename = os.path.abspath(self._path())
+
+    def emit(self, record: logging.LogRecord):
+        day = date.fromtimestamp(record.created)
+        if day != self.day:
+            self._switch(day, 0)
+            self.prune()
+        elif self.max_bytes and self.stream is not None and self.stream.tell() >= self.max_bytes:
+            self._switch(day, self.part + 1)
+        super().emit(record)
+
+    def prune(self):
+        oldest = datetime.now() - timedelta(days=self.retention_days)
+        for name in os.listdir(self.directory):
+            if (matches := re.fullmatch(r"(\d{4}-\d{2}-\d{2})(\.\d+)?\.txt", name)) is None:
+                continue
+            if datetime.strptime(matches.group(1), "%Y-%m-%d") < oldest:
+                os.remove(os.path.join(self.directory, name))
+
+
+def setup_logging(
+    directory: str = "logs",
+    max_bytes: int = 50 * 1024 * 1024,
+    retention_days: int = 30,
+    level: int | str = logging.INFO,
+) -> QueueListener:
+    # 产生日志的线程只合并消息参数并放进队列，格式化整行与写入文件、控制台都在后台线程中完成
+    formatter = logging.Formatter(FORMAT)
+    console_handler = logging.StreamHandler()
+    file_handler = DailyFileHandler(directory, max_bytes, retention_days)
+    for handler in (console_handler, file_handler):
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    listener = QueueListener(records, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
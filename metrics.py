@@ -0,0 +1,153 @@
+import contextlib
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Any
+
+from atomic_file import write_atomic
+from governor import governor
+
+
+# 请求耗时直方图的桶上界（秒）
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        # 取所在桶的上界，够用来发现变慢的接口；落在最后一个桶时取最大的有限上界，JSON中不能出现Infinity
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound if bound != math.inf else BUCKETS[-2]
+        return BUCKETS[-2]
+
+
+def _total(stats: dict[str, dict[str, int]]) -> dict[str, int]:
+    return {endpoint: counter["requests"] for endpoint, counter in stats.items()}
+
+
+class Metrics:
+    # 每轮检查的耗时与请求统计：阶段耗时、各接口请求数、耗时分布、流量、缓存命中率与重试次数
+    # 计数器（governor与各缓存）是进程级累计的，这里记录每轮开始时的值，汇总时取差
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.begin({})
+
+    def begin(self, caches: dict[str, Any]):
+        with self._lock:
+            self.started = time.time()
+            self.caches = caches
+            self._caches_start = {name: (cache.hits, cache.misses) for name, cache in caches.items()}
+            self._stats_start = governor.stats()
+            self.stages: dict[str, dict[str, Any]] = {}
+            self.latency: dict[str, Histogram] = defaultdict(Histogram)
+            self.bytes_sent: dict[str, int] = defaultdict(int)
+            self.bytes_received: dict[str, int] = defaultdict(int)
+
+    def observe(self, endpoint: str, seconds: float, sent: int, received: int):
+        with self._lock:
+            self.latency[endpoint].observe(seconds)
+            self.bytes_sent[endpoint] += sent
+            self.bytes_received[endpoint] += received
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        # 也可以作为装饰器使用；各阶段依次执行，阶段内的请求数按前后差计算
+        before = _total(governor.stats())
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            after = _total(governor.stats())
+            requests = {endpoint: n - before.get(endpoint, 0) for endpoint, n in after.items() if n != before.get(endpoint, 0)}
+            with self._lock:
+                self.stages[name] = {"seconds": round(elapsed, 3), "requests": sum(requests.values()), "endpoints": requests}
+
+    def summary(self) -> dict[str, Any]:
+        stats = governor.stats()
+        with self._lock:
+            endpoints = {}
+            for endpoint, counter in stats.items():
+                start = self._stats_start.get(endpoint, {})
+                delta = {key: n - start.get(key, 0) for key, n in counter.items()}
+                if not any(delta.values()):
+                    continue
+                histogram = self.latency.get(endpoint)
+                if histogram is not None and histogram.count:
+                    delta["latency_avg"] = round(histogram.sum / histogram.count, 4)
+                    delta["latency_p50"] = histogram.quantile(0.5)
+                    delta["latency_p95"] = histogram.quantile(0.95)
+                delta["bytes_sent"] = self.bytes_sent.get(endpoint, 0)
+                delta["bytes_received"] = self.bytes_received.get(endpoint, 0)
+                endpoints[endpoint] = delta
+            caches = {}
+            for name, cache in self.caches.items():
+                hits = cache.hits - self._caches_start[name][0]
+                misses = cache.misses - self._caches_start[name][1]
+                caches[name] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None}
+            return {
+                "started": self.started,
+                "seconds": round(time.time() - self.started, 3),
+                "stages": dict(self.stages),
+                "endpoints": endpoints,
+                "caches": caches,
+            }
+
+    def prometheus(self) -> str:
+        # Prometheus文本格式，描述最近一轮检查
+        summary = self.summary()
+        lines = [
+            "# TYPE bkr_cycle_seconds gauge",
+            f"bkr_cycle_seconds {summary['seconds']}",
+            "# TYPE bkr_cycle_started_timestamp gauge",
+            f"bkr_cycle_started_timestamp {summary['started']}",
+            "# TYPE bkr_stage_seconds gauge",
+        ]
+        lines += [f'bkr_stage_seconds{{stage="{name}"}} {stage["seconds"]}' for name, stage in summary["stages"].items()]
+        lines.append("# TYPE bkr_stage_requests gauge")
+        lines += [f'bkr_stage_requests{{stage="{name}"}} {stage["requests"]}' for name, stage in summary["stages"].items()]
+        for key in ("requests", "retries", "throttled", "failures", "dry_run", "skipped", "bytes_sent", "bytes_received"):
+            lines.append(f"# TYPE bkr_endpoint_{key} gauge")
+            lines += [f'bkr_endpoint_{key}{{endpoint="{endpoint}"}} {counter.get(key, 0)}' for endpoint, counter in summary["endpoints"].items()]
+        lines.append("# TYPE bkr_request_seconds histogram")
+        with self._lock:
+            for endpoint, histogram in self.latency.items():
+                cumulative = 0
+                for bound, n in zip(BUCKETS, histogram.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == math.inf else bound
+                    lines.append(f'bkr_request_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                lines.append(f'bkr_request_seconds_sum{{endpoint="{endpoint}"}} {histogram.sum:.4f}')
+                lines.append(f'bkr_request_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+        for key in ("hits", "misses"):
+            lines.append(f"# TYPE bkr_cache_{key} gauge")
+            lines += [f'bkr_cache_{key}{{cache="{name}"}} {cache[key]}' for name, cache in summary["caches"].items()]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        # 先写临时文件再替换，供node_exporter的textfile收集器读取
+        write_atomic(path, self.prometheus())
+
+
+metrics = Metrics()
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+from typing import Any, Callable
+
+from atomic_file import write_atomic
+
+
+def error_key(entry: dict) -> str:
+    # 与Outbox.deviant的键一致：(操作类型, 帖子/讨论帖/页面id)，错误类型从权限不足变为重试失败时仍是同一条错误
+    kind = entry["errorType"].rsplit("_", 1)[0]
+    target = next((entry[name] for name in ("postId", "threadId", "pageId") if entry.get(name) is not None), None)
+    return f"{kind}:{target}"
+
+
+# 每个列表中条目的键，生成增量时按键比较
+KEYS: dict[str, Callable[[dict], str]] = {
+    "pre_delete_pages": lambda entry: entry["link"],
+    "deleted_pages": lambda entry: entry["link"],
+    "errors": error_key,
+}
+
+
+def diff(previous: list[dict], current: list[dict], key: Callable[[dict], str]) -> dict[str, list]:
+    before = {key(entry): entry for entry in previous}
+    after = {key(entry): entry for entry in current}
+    return {
+        "added": [entry for name, entry in after.items() if name not in before],
+        "changed": [entry for name, entry in after.items() if name in before and before[name] != entry],
+        "removed": [name for name in before if name not in after],
+    }
+
+
+class DataWriter:
+    # 输出data.json：删除宣告页面的源代码按内容哈希存成单独文件，另写一份相对上次输出的增量文件
+    def __init__(self, path: str = "data.json", sources_dir: str = "sources"):
+        self.path = path
+        self.sources_dir = sources_dir
+        root, ext = os.path.splitext(path)
+        self.delta_path = f"{root}.delta{ext}"
+
+    def load(self) -> dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def store_source(self, source: str) -> str:
+        # 内容相同的源代码只存一份，文件写入后不再改变
+        data = source.encode("utf-8")
+        name = f"{hashlib.sha256(data).hexdigest()[:32]}.txt"
+        path = os.path.join(self.sources_dir, name)
+        if not os.path.exists(path):
+            os.makedirs(self.sources_dir, exist_ok=True)
+            write_atomic(path, source)
+        return f"{self.sources_dir}/{name}"
+
+    def prune(self, keep: set[str]):
+        # 只保留本次与上次输出引用的源代码文件，正在读取旧数据的前端仍能取到源代码
+        if not os.path.isdir(self.sources_dir):
+            return
+        for name in os.listdir(self.sources_dir):
+            if name.endswith(".txt") and f"{self.sources_dir}/{name}" not in keep:
+                os.remove(os.path.join(self.sources_dir, name))
+
+    def write(self, data: dict[str, Any]):
+        previous = self.load()
+        deleted_pages = []
+        for entry in data["deleted_pages"]:
+            entry = dict(entry)
+            entry["context_file"] = self.store_source(entry.pop("context"))
+            deleted_pages.append(entry)
+        data = {**data, "deleted_pages": deleted_pages}
+        delta = {
+            "since": previous.get("update_timestamp"),
+            "update_timestamp": data["update_timestamp"],
+            **{name: diff(previous.get(name, []), data[name], key) for name, key in KEYS.items()},
+        }
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False, separators=(",", ":"), allow_nan=False))
+        write_atomic(self.delta_path, json.dumps(delta, ensure_ascii=False, separators=(",", ":"), allow_nan=False))
+        self.prune({entry["context_file"] for entry in deleted_pages + previous.get("deleted_pages", []) if "context_file" in entry})
@@ -0,0 +1,88 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable
+
+
+class Outbox:
+    # 单轮或单个页面产生的结果，页面并发处理完成后按页面顺序合并，保证结果稳定
+    __slots__ = ("deviant", "pending_delete_pages", "pending_check_pages")
+
+    # 均为按键去重的有序字典，成员判断、删除与合并都不需要遍历，导出时取values()即可保持原有顺序
+    def __init__(self):
+        self.deviant: dict[Hashable, dict] = {}  # (操作类型, 帖子/讨论帖/页面id) -> 错误信息
+        self.pending_delete_pages: dict[int, dict] = {}  # 页面id -> 倒计时信息
+        self.pending_check_pages: dict[tuple[str, str], list] = {}  # (页面全名, 页面类型) -> [页面全名, 发布时分数, 页面类型]
+
+    def merge(self, other: "Outbox"):
+        self.deviant.update(other.deviant)
+        self.pending_delete_pages.update(other.pending_delete_pages)
+        self.pending_check_pages.update(other.pending_check_pages)
+
+
+_END = object()
+
+_outbox: contextvars.ContextVar[Outbox] = contextvars.ContextVar("outbox")
+
+
+def outbox() -> Outbox:
+    return _outbox.get()
+
+
+def bind_outbox(box: Outbox):
+    _outbox.set(box)
+
+
+async def _run_pages(pages: Iterable[Any], handler: Callable[[Any], Any], max_concurrency: int) -> list[tuple[Outbox, BaseException | None]]:
+    semaphore = asyncio.Semaphore(max_concurrency)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="page")
+
+    def run_isolated(page, box: Outbox):
+        bind_outbox(box)
+        return handler(page)
+
+    async def worker(page) -> tuple[Outbox, BaseException | None]:
+        box = Outbox()
+        async with semaphore:
+            # 每个页面的步骤仍在同一线程中依次执行，只有页面之间并发
+            try:
+                await loop.run_in_executor(
+                    executor, contextvars.copy_context().run, run_isolated, page, box)
+            except Exception as e:
+                return box, e
+        return box, None
+
+    # 页面来源可能是逐块请求的生成器，在线程中取下一个页面，取到即开始处理
+    iterator = iter(pages)
+    tasks = []
+    try:
+        try:
+            while (page := await loop.run_in_executor(None, next, iterator, _END)) is not _END:
+                tasks.append(asyncio.ensure_future(worker(page)))
+        except Exception:
+            # 列表请求失败时等待已开始的页面处理完成，再把错误抛给上层
+            await asyncio.gather(*tasks)
+            raise
+        return list(await asyncio.gather(*tasks))
+    finally:
+        executor.shutdown(wait=False)
+
+
+def process_pages(pages: Iterable[Any], handler: Callable[[Any], Any], max_concurrency: int = 1, finalize: Callable[[], Any] | None = None) -> list[tuple[Outbox, BaseException | None]]:
+    results = asyncio.run(_run_pages(pages, handler, max(1, max_concurrency)))
+    if finalize is not None:
+        # 在合并之前执行，延迟提交的写操作仍能把错误记录写回各页面的Outbox
+        finalize()
+    return results
+
+
+def merge_results(results: Iterable[tuple[Outbox, BaseException | None]]):
+    parent = outbox()
+    error = None
+    for box, e in results:
+        parent.merge(box)
+        if e is not None and error is None:
+            error = e
+    if error is not None:
+        raise error
@@ -0,0 +1,38 @@
+from typing import Iterable
+
+from timer_parser import Announcement
+
+
+# 倒计时链接中的时间戳取整到毫秒，比较截止时间时允许的误差（秒）
+DEADLINE_TOLERANCE = 1.0
+
+
+def reconcile_tags(tags: list[str], add: Iterable[str] = (), remove: Iterable[str] = ()) -> list[str] | None:
+    # 按集合计算期望的标签，保持原有顺序；与当前标签相同时返回None，不需要写入
+    remove = set(remove)
+    desired = [tag for tag in tags if tag not in remove]
+    desired += [tag for tag in dict.fromkeys(add) if tag not in desired]
+    if set(desired) == set(tags):
+        return None
+    return desired
+
+
+def same_announcement(current: Announcement | None, desired: Announcement) -> bool:
+    if current is None or current.kind != desired.kind:
+        return False
+    if desired.kind == "recovered":
+        return True
+    if desired.kind == "normal" and current.score != desired.score:
+        return False
+    return (
+        current.deadline is not None and desired.deadline is not None
+        and abs(current.deadline - desired.deadline) < DEADLINE_TOLERANCE
+    )
+
+
+def is_active(announcement: Announcement | None, now: float) -> bool:
+    # 仍在倒计时中的删除宣告
+    return (
+        announcement is not None and announcement.kind != "recovered"
+        and announcement.deadline is not None and announcement.deadline > now
+    )
@@ -0,0 +1,134 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qsl
+
+import httpx
+
+
+# 回放时的响应：(HTTP状态码, 响应文本)
+Reply = tuple[int, str]
+
+
+def form_value(value: Any) -> str:
+    # 与httpx表单编码一致，录制与回放得到相同的键
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if value is None:
+        return ""
+    return str(value)
+
+
+def request_key(method: str, site_name: str, target: dict[str, Any] | str) -> str:
+    if isinstance(target, dict):
+        target = {key: form_value(value) for key, value in target.items() if key != "wikidot_token7"}
+    return json.dumps([method, site_name, target], sort_keys=True, ensure_ascii=False)
+
+
+class Recorder:
+    # 把每个AMC请求与响应按行写入JSONL文件，供StandInServer回放
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, method: str, site_name: str, target: dict[str, Any] | str, response: httpx.Response):
+        line = json.dumps(
+            {"key": request_key(method, site_name, target), "status": response.status_code, "body": response.text},
+            ensure_ascii=False,
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def load_recordings(path: str) -> dict[str, Reply]:
+    # 同一请求录制了多次时使用最后一次的响应
+    recordings = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry["key"]] = (entry["status"], entry["body"])
+    return recordings
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "StandInServer"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        site_name = self.path.strip("/").partition("/")[0]
+        self.reply(*self.server.respond("POST", site_name, dict(parse_qsl(body, keep_blank_values=True))), "application/json")
+
+    def do_GET(self):
+        site_name, _, path = self.path.strip("/").partition("/")
+        self.reply(*self.server.respond("GET", site_name, path), "text/html; charset=utf-8")
+
+    def reply(self, status: int, text: str, content_type: str):
+        payload = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    # 本地AMC替身，地址形如 http://host:port/<站点名>/ajax-module-connector.php
+    # 先查录制的响应，未录制的请求交给fallback（例如合成站点），写操作一律返回ok
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        recordings: dict[str, Reply] | None = None,
+        fallback: Callable[[str, str, dict[str, str] | str], Reply | None] | None = None,
+    ):
+        super().__init__(address, StandInHandler)
+        self.recordings = recordings or {}
+        self.fallback = fallback
+        self.misses = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, method: str, site_name: str, target: dict[str, str] | str) -> Reply:
+        if (recorded := self.recordings.get(request_key(method, site_name, target))) is not None:
+            return recorded
+        if self.fallback is not None and (reply := self.fallback(method, site_name, target)) is not None:
+            return reply
+        if method == "POST" and "action" in target:
+            return 200, json.dumps({"status": "ok"})
+        self.misses += 1
+        return 404, json.dumps({"status": "not_found"})
+
+    def start(self) -> "StandInServer":
+        threading.Thread(target=self.serve_forever, name="stand-in", daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    # 用法：python replay.py 录制文件.jsonl [端口]
+    # 启动后把config.yaml中amc_pool.base_url设为输出的地址，并开启dry_run
+    server = StandInServer(
+        ("127.0.0.1", int(sys.argv[2]) if len(sys.argv) > 2 else 8080),
+        load_recordings(sys.argv[1]),
+    )
+    print(f"回放{len(server.recordings)}个请求：{server.base_url}")
+    server.serve_forever()
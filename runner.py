@@ -0,0 +1,63 @@
+import logging
+import multiprocessing
+import os
+import sys
+from typing import Any
+
+import yaml
+
+from app import App
+from governor import DEFAULT_BURST, DEFAULT_RATE
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_site(config_path: str, overrides: dict[str, Any], workdir: str):
+    # 子进程：在站点自己的目录中运行，状态、缓存、日志与输出文件互不影响
+    os.makedirs(os.path.join(workdir, "logs"), exist_ok=True)
+    os.chdir(workdir)
+    import bkr_delete
+    bkr_delete.app = App(config_path, poll=bkr_delete.poll_pages, overrides=overrides)
+    bkr_delete.setup_logging()
+    bkr_delete.run()
+
+
+def main(config_path: str = "config.yaml"):
+    config_path = os.path.abspath(config_path)
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    sites = config.get("managed_sites") or [{"siteUnixName": config["siteUnixName"]}]
+    sites_dir = os.path.abspath(config.get("sites_dir", "sites"))
+    session_path = os.path.abspath(config.get("session_path", "session.json"))
+
+    # 先在主进程登录一次并保存会话，各站点进程直接复用，不再各自登录
+    App(config_path, overrides={"session_path": session_path}).wd
+
+    # 各进程的令牌桶互相独立，而所有站点共用一个账号，把rate_limit平分给各站点，总请求速率不随站点数增加
+    # 站点中单独设置的rate_limit不再平分
+    limits = {"rate": DEFAULT_RATE, "burst": DEFAULT_BURST, **config.get("rate_limit", {})}
+    shared = {**limits, "rate": limits["rate"] / len(sites), "burst": max(1, limits["burst"] / len(sites))}
+
+    # 子进程用spawn启动，不继承主进程中AMC客户端的事件循环线程
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for site in sites:
+        name = site["siteUnixName"]
+        process = context.Process(
+            target=run_site,
+            # 登录会话文件由所有站点共用，其余相对路径都相对于站点目录
+            args=(config_path, {"rate_limit": shared, **site, "session_path": session_path}, os.path.join(sites_dir, name)),
+            name=name,
+        )
+        process.start()
+        logger.info("已启动%s，进程%s", name, process.pid)
+        processes.append(process)
+    for process in processes:
+        process.join()
+        logger.info("%s已退出，退出码%s", process.name, process.exitcode)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main(sys.argv[1] if len(sys.argv) > 1 else "config.yaml")
@@ -0,0 +1,138 @@
+import heapq
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from pipeline import Outbox
+
+
+logger = logging.getLogger(__name__)
+
+
+Snapshot = tuple  # (分数, 标签集合, 修订次数)
+
+
+class Scheduler:
+    # 记录页面快照，只把发生变化或定时到期的页面送入删除逻辑，其余页面沿用上一次的结果
+    def __init__(
+        self,
+        poll: Callable[[], Iterable[tuple[str, Snapshot]]],
+        poll_interval: float = 300,
+        full_rescan_interval: float = 21600,
+    ):
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.full_rescan_interval = full_rescan_interval
+        self.full = True
+        self._last_full = 0.0
+        self._lock = threading.Lock()
+        self._snapshots: dict[str, Snapshot] = {}
+        self._timers: list[tuple[float, str]] = []
+        self._due: dict[str, float] = {}  # 每个页面当前有效的定时，堆中与之不符的条目已经作废
+        self._dirty: set[str] = set()
+        self._carried: set[str] = set()  # 超出预算留到下一轮处理的页面
+        self._next_carried: set[str] = set()
+        self._results: dict[str, dict[str, Outbox]] = {}
+
+    def schedule(self, fullname: str, due: float):
+        # 每个页面只保留最近一次设置的定时，每次处理页面时重复设置同一时间不会在堆中新增条目
+        with self._lock:
+            if self._due.get(fullname) == due:
+                return
+            self._due[fullname] = due
+            heapq.heappush(self._timers, (due, fullname))
+            if len(self._timers) > 2 * len(self._due) + 64:
+                self._timers = [(due, fullname) for fullname, due in self._due.items()]
+                heapq.heapify(self._timers)
+
+    def _drop_stale(self):
+        while self._timers and self._due.get(self._timers[0][1]) != self._timers[0][0]:
+            heapq.heappop(self._timers)
+
+    def observe(self, snapshots: Iterable[tuple[str, Snapshot]]) -> int:
+        changed = 0
+        with self._lock:
+            for fullname, snapshot in snapshots:
+                if self._snapshots.get(fullname) != snapshot:
+                    self._snapshots[fullname] = snapshot
+                    self._dirty.add(fullname)
+                    changed += 1
+        return changed
+
+    def should_run(self) -> bool:
+        now = time.time()
+        with self._lock:
+            self._drop_stale()
+            while self._timers and self._timers[0][0] <= now:
+                fullname = heapq.heappop(self._timers)[1]
+                del self._due[fullname]
+                self._dirty.add(fullname)
+                self._drop_stale()
+        changed = self.observe(self.poll())
+        if changed:
+            logger.info("检测到%s个页面发生变化", changed)
+        if now - self._last_full >= self.full_rescan_interval:
+            self.full = True
+        return self.full or bool(self._dirty) or bool(self._carried)
+
+    def sleep_time(self) -> float:
+        now = time.time()
+        wakeup = now + self.poll_interval
+        with self._lock:
+            self._drop_stale()
+            if self._timers:
+                wakeup = min(wakeup, self._timers[0][0])
+        return max(0.0, wakeup - now)
+
+    def wants(self, stage: str, fullname: str) -> bool:
+        with self._lock:
+            return (
+                self.full or fullname in self._dirty or fullname in self._carried
+                or fullname not in self._results.get(stage, {})
+            )
+
+    def update(self, stage: str, fullname: str, box: Outbox | None):
+        # 单独重新检查的页面：保存新结果，None时丢弃旧结果，下一轮重新处理
+        with self._lock:
+            results = self._results.setdefault(stage, {})
+            if box is None:
+                results.pop(fullname, None)
+            else:
+                results[fullname] = box
+
+    def changed(self, stage: str, fullname: str) -> bool:
+        # 新出现、发生变化、定时到期或上一轮超出预算留下的页面，而不只是完整复查
+        # 留下的页面至少按变化处理，不会在之后的每一轮中都排在例行复查之后而一直得不到处理
+        with self._lock:
+            return (
+                fullname in self._dirty or fullname in self._carried
+                or fullname not in self._results.get(stage, {})
+            )
+
+    def carry(self, fullnames: Iterable[str]):
+        with self._lock:
+            self._next_carried.update(fullnames)
+
+    def result(self, stage: str, fullname: str) -> Outbox | None:
+        with self._lock:
+            return self._results.get(stage, {}).get(fullname)
+
+    def remember(self, stage: str, fullnames: list[str], results: dict[str, Outbox | None]):
+        # 只保留本轮仍在候选列表中的页面的结果；本轮处理过但结果为None的页面丢弃旧结果，下一轮重新处理
+        with self._lock:
+            previous = self._results.get(stage, {})
+            merged = {fullname: results[fullname] if fullname in results else previous.get(fullname) for fullname in fullnames}
+            self._results[stage] = {fullname: box for fullname, box in merged.items() if box is not None}
+
+    def finish(self):
+        with self._lock:
+            if self.full:
+                self._last_full = time.time()
+            self.full = False
+            self._dirty.clear()
+            self._carried, self._next_carried = self._next_carried, set()
+
+
+def snapshot(rating: Any, tags: Iterable[str], revisions: Any) -> Snapshot:
+    return (float(rating), frozenset(tags), int(revisions))
@@ -0,0 +1,36 @@
+import json
+import os
+import time
+
+from atomic_file import write_atomic
+
+
+class SessionCache:
+    # 保存登录后的WIKIDOT_SESSION_ID，重启后在有效期内直接复用，不必每次重新登录
+    def __init__(self, path: str = "session.json", ttl: float = 86400):
+        self.path = path
+        self.ttl = ttl
+
+    def load(self, username: str) -> str | None:
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                session = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if session.get("username") != username or time.time() - session.get("created_at", 0) > self.ttl:
+            return None
+        return session.get("session_id")
+
+    def save(self, username: str, session_id: str):
+        # 创建时即只允许本用户读写，会话id不会在写入期间被其他用户读取
+        write_atomic(
+            self.path,
+            json.dumps({"username": username, "session_id": session_id, "created_at": time.time()}),
+            0o600,
+        )
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,64 @@
+import logging
+import pickle
+import threading
+import time
+from typing import Callable
+
+from wikidot.module.site import Site
+
+from amc_client import AMCClient
+from atomic_file import write_atomic
+from listing import list_fullnames
+
+
+logger = logging.getLogger(__name__)
+
+
+class SisterIndex:
+    # 其他站点的页面全名索引，用于判断页面是否为翻译，过期后完整重建，期间只增量补充新建页面
+    def __init__(self, resolve: Callable[[str], Site], client: AMCClient, site_names: list[str], ttl: float = 86400, path: str = "sister_index.pkl"):
+        self.resolve = resolve
+        self.client = client
+        self.site_names = site_names
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._sites: dict[str, Site] = {}
+        try:
+            with open(path, "rb") as file:
+                self._indexes: dict[str, dict] = pickle.load(file)
+        except FileNotFoundError:
+            self._indexes = {}
+
+    def site(self, name: str) -> Site:
+        # 每个进程只解析一次站点
+        with self._lock:
+            if name not in self._sites:
+                self._sites[name] = self.resolve(name)
+            return self._sites[name]
+
+    def refresh(self):
+        now = time.time()
+        for name in self.site_names:
+            index = self._indexes.get(name)
+            if index is None or now - index["built_at"] > self.ttl:
+                logger.info("重建%s的页面索引", name)
+                self._indexes[name] = {
+                    "names": list_fullnames(self.client, self.site(name)),
+                    "built_at": now,
+                    "refreshed_at": now,
+                }
+            else:
+                # 多取10分钟，避免与上次刷新之间出现遗漏
+                seconds = int(now - index["refreshed_at"]) + 600
+                created = list_fullnames(self.client, self.site(name), created_at=f"> -{seconds}")
+                logger.info("%s的页面索引新增%s个页面", name, len(created - index['names']))
+                index["names"] |= created
+                index["refreshed_at"] = now
+        self.save()
+
+    def __contains__(self, fullname: str) -> bool:
+        return any(fullname in self._indexes[name]["names"] for name in self.site_names if name in self._indexes)
+
+    def save(self):
+        write_atomic(self.path, pickle.dumps(self._indexes))
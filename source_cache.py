@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class SourceCache:
+    # 页面id -> (修订次数, 压缩后的源代码)，修订次数不变时源代码不变，超过容量时淘汰最久未使用的页面
+    def __init__(self, path: str = "page_sources.db", max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                page_id INTEGER PRIMARY KEY,
+                revision INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sources_used_at ON sources (used_at);
+            """
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+
+    def get(self, page_id: int, revision: int) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sources WHERE page_id = ? AND revision = ?", (page_id, revision)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE sources SET used_at = ? WHERE page_id = ?", (time.time(), page_id))
+            return zlib.decompress(row[0]).decode("utf-8")
+
+    def set(self, page_id: int, revision: int, source: str):
+        data = zlib.compress(source.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                (page_id, revision, data, len(data), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM sources").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        expired = []
+        for page_id, size in self._conn.execute("SELECT page_id, size FROM sources ORDER BY used_at"):
+            if total <= self.max_bytes:
+                break
+            expired.append((page_id,))
+            total -= size
+        self._conn.executemany("DELETE FROM sources WHERE page_id = ?", expired)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
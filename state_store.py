@@ -0,0 +1,182 @@
+import json
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Iterator, MutableMapping
+
+from atomic_file import write_atomic
+
+
+# 每条记录为 [发布时分数, 倒计时基准时间戳, 页面全名]
+Record = list
+
+
+class PickleStateStore(dict):
+    # 旧的整文件pickle存储，每轮结束时整体写入
+    def __init__(self, path: str = "deleted_pages.pkl"):
+        self.path = path
+        try:
+            with open(path, "rb") as file:
+                super().__init__(pickle.load(file))
+        except FileNotFoundError:
+            super().__init__()
+
+    def expiring(self, before: float) -> dict[int, Record]:
+        return dict(sorted(
+            ((page_id, record) for page_id, record in self.items() if record[1] <= before),
+            key=lambda item: item[1][1],
+        ))
+
+    def save(self):
+        write_atomic(self.path, pickle.dumps(dict(self)))
+
+    def close(self):
+        pass
+
+
+class SqliteStateStore(MutableMapping):
+    # SQLite(WAL)存储，每条记录在确定后立即写入，崩溃时最多丢失正在处理的页面
+    def __init__(self, path: str = "pending_pages.db", migrate_from: str | None = "deleted_pages.pkl"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pending_pages (
+                page_id INTEGER PRIMARY KEY,
+                score INTEGER NOT NULL,
+                timestamp REAL NOT NULL,
+                fullname TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pending_pages_timestamp ON pending_pages (timestamp);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        if migrate_from is not None:
+            self._migrate(migrate_from)
+
+    def _migrate(self, pickle_path: str):
+        # 仅在首次创建数据库时从旧的pickle文件导入一次
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is not None:
+                return
+            try:
+                with open(pickle_path, "rb") as file:
+                    records: dict[int, Record] = pickle.load(file)
+            except FileNotFoundError:
+                records = {}
+            now = time.time()
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO pending_pages VALUES (?, ?, ?, ?, ?)",
+                [(page_id, score, timestamp, fullname, now) for page_id, (score, timestamp, fullname) in records.items()],
+            )
+            self._conn.execute("INSERT INTO meta VALUES ('migrated', ?)", (pickle_path,))
+            self._conn.execute("COMMIT")
+
+    def __getitem__(self, page_id: int) -> Record:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT score, timestamp, fullname FROM pending_pages WHERE page_id = ?", (page_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(page_id)
+        return list(row)
+
+    def __setitem__(self, page_id: int, record: Record):
+        score, timestamp, fullname = record
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO pending_pages VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (page_id) DO UPDATE SET
+                    score = excluded.score,
+                    timestamp = excluded.timestamp,
+                    fullname = excluded.fullname,
+                    updated_at = excluded.updated_at
+                """,
+                (page_id, score, timestamp, fullname, time.time()),
+            )
+
+    def __delitem__(self, page_id: int):
+        with self._lock:
+            if self._conn.execute("DELETE FROM pending_pages WHERE page_id = ?", (page_id,)).rowcount == 0:
+                raise KeyError(page_id)
+
+    def __contains__(self, page_id) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM pending_pages WHERE page_id = ?", (page_id,)
+            ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[int]:
+        with self._lock:
+            page_ids = [row[0] for row in self._conn.execute("SELECT page_id FROM pending_pages ORDER BY rowid")]
+        return iter(page_ids)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_pages").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"SqliteStateStore({self.path!r}, {len(self)} pages)"
+
+    def expiring(self, before: float) -> dict[int, Record]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_id, score, timestamp, fullname FROM pending_pages WHERE timestamp <= ? ORDER BY timestamp",
+                (before,),
+            ).fetchall()
+        return {row[0]: list(row[1:]) for row in rows}
+
+    def save(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_state_store(config: dict) -> PickleStateStore | SqliteStateStore:
+    if config.get("state_backend", "sqlite") == "pickle":
+        return PickleStateStore(config.get("state_path", "deleted_pages.pkl"))
+    return SqliteStateStore(config.get("state_path", "pending_pages.db"))
+
+
+def query_countdowns(path: str = "pending_pages.db", expiring_before: float | None = None) -> list[dict]:
+    # 只读查询接口，供其他工具查看倒计时状态，不会加载全部数据也不会写入
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT page_id, score, timestamp, fullname, updated_at FROM pending_pages "
+            "WHERE timestamp <= ? ORDER BY timestamp",
+            (float("inf") if expiring_before is None else expiring_before,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [
+        {
+            "page_id": page_id,
+            "release_score": score,
+            "timestamp": timestamp,
+            "fullname": fullname,
+            "updated_at": updated_at,
+        }
+        for page_id, score, timestamp, fullname, updated_at in rows
+    ]
+
+
+if __name__ == "__main__":
+    # 用法：python state_store.py [数据库路径] [距今秒数内到期]
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "pending_pages.db"
+    before = time.time() + float(sys.argv[2]) if len(sys.argv) > 2 else None
+    json.dump(query_countdowns(db_path, before), sys.stdout, ensure_ascii=False, indent=2)
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+
+logger = logging.getLogger(__name__)
+
+# /rechecks中保留的检查请求数量
+MAX_RECHECKS = 100
+
+STATUS_TEXT = {200: "OK", 202: "Accepted", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def _encode(value: Any) -> tuple[bytes, str]:
+    body = json.dumps(value, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+class StatusAPI:
+    # 本地状态接口：每轮结束时发布结果，请求直接读取内存中序列化好的数据，支持ETag条件请求
+    # POST /recheck?id=<页面id>或?page=<页面全名>（可以重复）把页面加入待检查队列并立即唤醒主循环，处理结果在GET /rechecks中查看
+    # 检查请求为(参数名, 值)，全为数字的全名也按全名处理
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765):
+        self.host = host
+        self.port = port
+        self._lock = threading.Lock()
+        self._resources: dict[str, tuple[bytes, str]] = {}
+        self._requested: list[tuple[str, str]] = []
+        self._rechecks: dict[tuple[str, str], dict[str, Any]] = {}
+        self._wakeup = threading.Event()
+        self._report([], "queued")
+
+    def publish(self, resources: dict[str, Any]):
+        encoded = {f"/{name}": _encode(value) for name, value in resources.items()}
+        with self._lock:
+            self._resources = {**encoded, "/rechecks": self._resources["/rechecks"]}
+
+    def report(self, request: tuple[str, str], status: str, **details: Any):
+        # 记录检查请求的处理状态：queued、done、failed、not_found（页面不存在）或ignored（不属于任何检查阶段）
+        self._report([request], status, **details)
+
+    def _report(self, requests: list[tuple[str, str]], status: str, **details: Any):
+        with self._lock:
+            for request in requests:
+                self._rechecks.pop(request, None)
+                self._rechecks[request] = {request[0]: request[1], "status": status, "time": time.time(), **details}
+            while len(self._rechecks) > MAX_RECHECKS:
+                del self._rechecks[next(iter(self._rechecks))]
+            self._resources["/rechecks"] = _encode(list(self._rechecks.values()))
+
+    def take_requests(self) -> list[tuple[str, str]]:
+        with self._lock:
+            requested, self._requested = self._requested, []
+        return requested
+
+    def wait(self, timeout: float):
+        # 代替主循环中的time.sleep，收到检查请求时提前返回
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def respond(self, method: str, target: str, headers: dict[str, str]) -> tuple[int, bytes, dict[str, str]]:
+        url = urlsplit(target)
+        if method == "POST" and url.path == "/recheck":
+            query = parse_qs(url.query)
+            requests = [(name, value) for name in ("id", "page") for value in query.get(name, [])]
+            if not requests:
+                return 400, b'{"error":"missing id or page"}', {}
+            if not all(value.isdigit() for name, value in requests if name == "id"):
+                return 400, b'{"error":"id must be a number"}', {}
+            with self._lock:
+                self._requested.extend(requests)
+            self._report(requests, "queued")
+            self._wakeup.set()
+            logger.info("收到检查请求：%s", requests)
+            queued = [{name: value} for name, value in requests]
+            return 202, json.dumps({"queued": queued, "status": "/rechecks"}, ensure_ascii=False).encode("utf-8"), {}
+        if method != "GET":
+            return 405, b'{"error":"method not allowed"}', {}
+        with self._lock:
+            resource = self._resources.get("/status" if url.path == "/" else url.path)
+        if resource is None:
+            return 404, b'{"error":"not found"}', {}
+        body, etag = resource
+        if headers.get("if-none-match") == etag:
+            return 304, b"", {"ETag": etag}
+        return 200, body, {"ETag": etag, "Cache-Control": "no-cache"}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if length := int(headers.get("content-length", 0)):
+                    await reader.readexactly(length)
+                status, body, extra = self.respond(method, target, headers)
+                head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}", "Content-Type: application/json; charset=utf-8",
+                        f"Content-Length: {len(body)}", *(f"{name}: {value}" for name, value in extra.items())]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("状态接口已启动：http://%s:%s/", self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    def start(self) -> "StatusAPI":
+        threading.Thread(target=asyncio.run, args=(self._serve(),), name="status-api", daemon=True).start()
+        return self
+
@@ -0,0 +1,48 @@
+from listing import missing_pages
+
+
+class StubResponse:
+    def __init__(self, body: str):
+        self.body = body
+
+    def json(self) -> dict:
+        return {"status": "ok", "body": self.body}
+
+
+class StubClient:
+    # 只认识existing中的页面，记录每次请求的页面全名
+    def __init__(self, existing: set[str]):
+        self.existing = existing
+        self.requested: list[str] = []
+
+    def request(self, site, bodies: list[dict]) -> list[StubResponse]:
+        responses = []
+        for body in bodies:
+            fullname = body["fullname"]
+            self.requested.append(fullname)
+            if fullname in self.existing:
+                html = f'<div class="page"><span class="set fullname"><span class="value"> {fullname} </span></span></div>'
+            else:
+                html = ""
+            responses.append(StubResponse(html))
+        return responses
+
+
+def test_missing_pages_only_requests_unknown_names():
+    tracked = [f"page-{i}" for i in range(5000)]
+    known = set(tracked[:4000])  # 本轮候选列表中出现过的页面
+    gone = set(tracked[4000::3])
+    client = StubClient(existing=set(tracked) - gone)
+
+    missing = missing_pages(client, object(), tracked, known)
+
+    assert missing == gone
+    assert client.requested == tracked[4000:]
+
+
+def test_missing_pages_without_unknown_names_sends_nothing():
+    tracked = [f"page-{i}" for i in range(3000)]
+    client = StubClient(existing=set())
+
+    assert missing_pages(client, object(), tracked, set(tracked)) == set()
+    assert client.requested == []
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from timer_parser import parse_announcement, parse_timer
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    parse_announcement.cache_clear()
+    yield
+    parse_announcement.cache_clear()
+
+
+def parsed(text: str, link: str | None) -> tuple:
+    result = parse_announcement(text, link)
+    return result.kind, result.deadline, result.score
+
+
+def test_arandintday_timestamp():
+    assert parsed(
+        "本页分数为-3分，倒计时结束后删除。",
+        "https://arandintday.github.io/timer/?timestamp=1700000000000&type=delete",
+    ) == ("normal", 1700000000.0, -3)
+
+
+def test_backroomswiki_epoch_milliseconds():
+    assert parsed(
+        "由于条目的分数为-5分，现根据删除政策，宣告将删除此页：",
+        "https://timer.backroomswiki.cn/timer/time=1700000000123.456/type=delete",
+    ) == ("normal", 1700000000.123, -5)
+
+
+def test_backroomswiki_iso_time_is_utc(monkeypatch):
+    # 链接中的时间以Z结尾，按UTC解析，与运行环境的时区无关
+    monkeypatch.setenv("TZ", "Asia/Shanghai")
+    time.tzset()
+    try:
+        assert parsed(
+            "由于条目的分数为 -12 分，且距离发布时间已满1个月，现根据删除政策，宣告将删除此页：",
+            "https://timer.backroomswiki.cn/timer/time=2023-11-14T22:13:20.000Z/type=delete",
+        ) == ("normal", 1700000000.0, -12)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_translate():
+    assert parsed(
+        "由于翻译质量不佳，宣告删除。",
+        "https://timer.backroomswiki.cn/timer/time=1700000000000/type=delete",
+    ) == ("translate", 1700000000.0, None)
+
+
+def test_recovered():
+    assert parsed("【分数回升，倒计时停止】", None) == ("recovered", None, None)
+
+
+@pytest.mark.parametrize("link", ["https://example.com/timer/1700000000", "", None])
+def test_unknown_link_has_no_deadline(link):
+    assert parse_timer(link) is None
+    assert parsed("由于条目的分数为-5分，宣告将删除此页：", link) == ("normal", None, -5)
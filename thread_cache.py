@@ -0,0 +1,49 @@
+import threading
+import time
+
+from forum_parser import Post
+
+
+class ThreadState:
+    # 讨论帖上一次完整读取后的状态：分页数、帖子数、最后一个帖子id与找到的职员帖
+    __slots__ = ("pagers", "post_count", "last_post_id", "staff_post", "checked_at")
+
+    def __init__(self, pagers: int, post_count: int | None, last_post_id: int, staff_post: Post | None):
+        self.pagers = pagers
+        self.post_count = post_count
+        self.last_post_id = last_post_id
+        self.staff_post = staff_post
+        self.checked_at = time.time()
+
+
+class ThreadCache:
+    # 讨论帖id -> ThreadState，超过ttl秒后强制完整读取一次，以发现他人对删除宣告的修改
+    def __init__(self, ttl: float = 21600):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._threads: dict[int, ThreadState] = {}
+
+    def get(self, thread_id: int) -> ThreadState | None:
+        with self._lock:
+            state = self._threads.get(thread_id)
+            if state is not None and time.time() - state.checked_at > self.ttl:
+                del self._threads[thread_id]
+                state = None
+            return state
+
+    def set(self, thread_id: int, state: ThreadState):
+        with self._lock:
+            self._threads[thread_id] = state
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def invalidate(self, thread_id: int):
+        with self._lock:
+            self._threads.pop(thread_id, None)
@@ -0,0 +1,54 @@
+import functools
+import re
+from datetime import datetime, timezone
+from typing import Callable
+
+
+SCORE = re.compile(r"分数为 ?(-?\d+) ?分")
+
+# 倒计时链接格式：(域名, 预编译的正则, 匹配结果 -> 截止时间戳)，按注册顺序尝试
+_TIMERS: list[tuple[str, re.Pattern, Callable[[re.Match], float]]] = []
+
+
+def register_timer(host: str, pattern: str, convert: Callable[[re.Match], float]):
+    _TIMERS.append((host, re.compile(pattern), convert))
+
+
+register_timer("arandintday.github.io", r"timestamp=(\d+)", lambda m: float(m.group(1)) / 1000)
+# 以Z结尾的时间为UTC，不按运行环境的时区解析
+register_timer("timer.backroomswiki.cn", r"/time=(.*?)\.000Z", lambda m: datetime.fromisoformat(m.group(1)).replace(tzinfo=timezone.utc).timestamp())
+register_timer("timer.backroomswiki.cn", r"/time=(\d+)", lambda m: float(m.group(1)) / 1000)
+
+
+class Announcement:
+    # 删除宣告的解析结果，kind为recovered（分数回升）、translate或normal
+    __slots__ = ("kind", "deadline", "score")
+
+    def __init__(self, kind: str, deadline: float | None, score: int | None):
+        self.kind = kind
+        self.deadline = deadline
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"Announcement({self.kind!r}, deadline={self.deadline}, score={self.score})"
+
+
+def parse_timer(link: str | None) -> float | None:
+    if not link:
+        return None
+    for host, pattern, convert in _TIMERS:
+        if host in link and (matches := pattern.search(link)) is not None:
+            return convert(matches)
+    return None
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_announcement(text: str, timer_link: str | None) -> Announcement:
+    # 帖子内容不变时结果不变，按内容缓存，未修改的删除宣告每轮不再重复解析
+    if "分数回升" in text:
+        return Announcement("recovered", None, None)
+    deadline = parse_timer(timer_link)
+    if "翻译" in text:
+        return Announcement("translate", deadline, None)
+    matches = SCORE.search(text)
+    return Announcement("normal", deadline, int(matches.group(1)) if matches is not None else None)
@@ -0,0 +1,44 @@
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from governor import governor
+
+
+# 优先级，数值越小越先处理：到期或即将到期的倒计时与-30分以下页面、新出现或发生变化的页面、例行复查
+URGENT = 0
+CHANGED = 1
+ROUTINE = 2
+
+
+# 列出页面与获取页面id的请求与处理页面交替进行，不计入预算
+LISTING_ENDPOINTS = {"list/ListPagesModule", "GET"}
+
+
+def _requests() -> int:
+    return sum(counter["requests"] for endpoint, counter in governor.stats().items() if endpoint not in LISTING_ENDPOINTS)
+
+
+class Budget:
+    # 每轮的时间与请求预算，None为不限制；超出后只处理紧急页面，其余页面留到下一轮
+    def __init__(self, seconds: float | None = None, requests: int | None = None):
+        self.seconds = seconds
+        self.requests = requests
+        self._lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        with self._lock:
+            self._started = time.monotonic()
+            self._requests_start = _requests()
+
+    def exhausted(self) -> bool:
+        with self._lock:
+            if self.seconds is not None and time.monotonic() - self._started >= self.seconds:
+                return True
+            return self.requests is not None and _requests() - self._requests_start >= self.requests
+
+
+def prioritize(items: Iterable[Any], priority: Callable[[Any], int]) -> list[tuple[int, Any]]:
+    # 稳定排序，同一优先级内保持列表原有顺序
+    return sorted(((priority(item), item) for item in items), key=lambda pair: pair[0])
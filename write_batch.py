@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+import httpx
+
+from governor import governor
+from pipeline import Outbox, outbox
+
+
+logger = logging.getLogger(__name__)
+
+
+class PendingWrite:
+    # 排队中的写操作，flush后ok为True/False，并把错误记录写回发起页面的Outbox
+    __slots__ = ("kind", "body", "error_dict", "box", "depends_on", "ok", "error_key")
+
+    def __init__(self, kind: str, body: dict[str, Any], error_dict: dict, box: Outbox, depends_on: "PendingWrite | None"):
+        self.kind = kind
+        self.body = body
+        self.error_dict = error_dict
+        self.box = box
+        self.depends_on = depends_on
+        self.ok: bool | None = None
+        self.error_key = (kind, body.get("postId", body.get("pageId")))
+
+
+class WriteBatch:
+    # 收集一轮检查中的帖子修改与标签修改，按chunk_size分批发送
+    def __init__(self, request: Callable[[list[dict[str, Any]]], list[httpx.Response]], chunk_size: int = 20, times: int = 3):
+        self.request = request
+        self.chunk_size = max(1, chunk_size)
+        self.times = times
+        self._lock = threading.Lock()
+        self._queues: dict[str, list[PendingWrite]] = {"edit_post": [], "edit_tags": []}
+
+    def add(self, kind: str, body: dict[str, Any], error_dict: dict, depends_on: PendingWrite | None = None) -> PendingWrite:
+        write = PendingWrite(kind, body, error_dict, outbox(), depends_on)
+        with self._lock:
+            self._queues[kind].append(write)
+        return write
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def flush(self):
+        # 先提交帖子修改，标签修改可能依赖删除宣告是否修改成功
+        for kind in ("edit_post", "edit_tags"):
+            with self._lock:
+                writes, self._queues[kind] = self._queues[kind], []
+            ready = []
+            for write in writes:
+                if write.depends_on is not None and not write.depends_on.ok:
+                    logger.info("删除宣告修改失败，跳过%s的标签修改", write.body.get('pageId'))
+                    write.ok = False
+                else:
+                    ready.append(write)
+            if ready:
+                logger.info("批量提交%s个%s请求", len(ready), kind)
+                self._send(ready)
+
+    def _send(self, writes: list[PendingWrite]):
+        # 只重试返回失败状态的请求；网络错误已经在AMCClient中重试过，不再整批重试
+        for attempt in range(self.times):
+            failed = []
+            for start in range(0, len(writes), self.chunk_size):
+                chunk = writes[start:start + self.chunk_size]
+                try:
+                    responses = self.request([write.body for write in chunk])
+                except Exception as e:
+                    logger.error("批量提交失败：%s，跳过修改", e)
+                    self._give_up(chunk)
+                    continue
+                for write, response in zip(chunk, responses):
+                    status = response.json()["status"]
+                    if status == "ok":
+                        write.ok = True
+                    elif status == "no_permission":
+                        write.ok = False
+                        write.error_dict["errorType"] = f"{write.kind}_permission"
+                        write.box.deviant[write.error_key] = write.error_dict
+                        logger.warning("缺少编辑权限，跳过修改")
+                    else:
+                        logger.warning("编辑失败，状态为%s，准备重试", status)
+                        failed.append(write)
+            if not failed:
+                return
+            writes = failed
+            if attempt < self.times - 1:
+                time.sleep(governor.backoff(attempt))
+        logger.error("放弃重试，跳过修改")
+        self._give_up(writes)
+
+    def _give_up(self, writes: list[PendingWrite]):
+        for write in writes:
+            write.ok = False
+            write.error_dict["errorType"] = f"{write.kind}_unknown"
+            write.box.deviant[write.error_key] = write.error_dict